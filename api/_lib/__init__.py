@@ -0,0 +1,4 @@
+# learn-rust-production-repo/api/_lib/__init__.py
+#
+# Shared helpers for the FastAPI agent in api/index.py.
+# The leading underscore keeps Vercel from treating these files as functions.
@@ -0,0 +1,380 @@
+# learn-rust-production-repo/api/_lib/agent.py
+
+import asyncio
+import contextlib
+import os
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from . import llm
+from .bm25 import get_bm25_index
+from .cache import response_cache, response_cache_key
+from .context import pack_context
+from .corpus import corpus_version, lessons_for_day
+from .deadline import Deadline, run_stage, stage_timeouts
+from .debugger import submit_debug_job
+from .error_index import answer_for_codes, known_codes
+from .lazy import lazy_import
+from .metering import estimate_messages_tokens, estimate_tokens, token_meter
+from .prompts import prompt_templates
+from .ratelimit import RateLimited, rate_limiter
+from .semantic_cache import semantic_cache
+from .singleflight import agent_flights
+
+# numpy-backed, so only loaded once a request actually retrieves
+vector_index = lazy_import(f"{__package__}.vector_index")
+
+# Candidate passages retrieved per query, before packing them into the token budget
+RETRIEVAL_K = 8
+
+# Reciprocal-rank-fusion constant (the usual 60 from the RRF paper)
+RRF_K = 60
+
+# Concurrent LLM calls per /agent/batch request
+BATCH_CONCURRENCY = int(os.environ.get("AGENT_BATCH_CONCURRENCY", "4"))
+
+# How each answer was produced: exact_cache, semantic_cache, error_index, llm,
+# llm_truncated, retrieval_fallback or placeholder (no LLM configured)
+answer_paths: Counter = Counter()
+
+def parse_day_index(query_data: Dict) -> Optional[int]:
+    """Reads `day_index` from the request body, tolerating strings and missing values."""
+    try:
+        return int(query_data["day_index"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retrieve_context(user_query: str, day_index: Optional[int]) -> List[Dict]:
+    """Returns the lesson passages the LLM should see for this query, packed to the context budget."""
+    return retrieve_context_batch([user_query], [day_index])[0]
+
+
+def retrieve_context_batch(user_queries: List[str], day_indexes: List[Optional[int]]) -> List[List[Dict]]:
+    """retrieve_context for many queries, scoring all of them in one vector-index product."""
+    # Mentioning the current lesson's title steers ambiguous questions
+    # ("why can't I assign twice?") towards the day the learner is on.
+    queries = [
+        f"{user_query} {' '.join(lesson['title'] for lesson in lessons_for_day(day_index))}".strip()
+        for user_query, day_index in zip(user_queries, day_indexes)
+    ]
+    dense = vector_index.get_index().search_batch(queries, k=RETRIEVAL_K * 2)
+    bm25 = get_bm25_index()
+    return [
+        pack_context(
+            fuse_rankings([dense_hits, bm25.search(query, k=RETRIEVAL_K * 2)], k=RETRIEVAL_K), day_index=day_index
+        )
+        for query, dense_hits, day_index in zip(queries, dense, day_indexes)
+    ]
+
+
+def fuse_rankings(rankings: List[List[Dict]], k: int) -> List[Dict]:
+    """
+    Merges ranked passage lists with reciprocal rank fusion, so dense and
+    BM25 scores (which are on different scales) can be combined.
+    """
+    fused: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, passage in enumerate(ranking):
+            entry = fused.setdefault(passage["id"], {**passage, "score": 0.0})
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+    ranked = sorted(fused.values(), key=lambda p: p["score"], reverse=True)[:k]
+    for passage in ranked:
+        passage["score"] = round(passage["score"], 4)
+    return ranked
+
+
+def check_token_budget(query_data: Dict, user_id: str) -> None:
+    """
+    Rejects the request up front (TokenBudgetExceeded) if its prompt would
+    overrun the learner's daily budget. The estimate covers the day's system
+    prefix, the question and the code; the retrieved notes are only known
+    later, when the LLM stage reserves the full prompt (see _answer_events).
+    """
+    check_batch_token_budget([query_data], user_id)
+
+
+def check_batch_token_budget(items: List[Dict], user_id: str) -> None:
+    """check_token_budget for a whole /agent/batch: the sum of every item's prompt must fit."""
+    estimate = sum(
+        estimate_messages_tokens(prompt_templates.build_messages(
+            parse_day_index(item), [], str(item.get("query", "")), item.get("code")
+        ))
+        for item in items
+    )
+    token_meter.check(user_id, estimate)
+
+
+async def agent_events(
+    query_data: Dict,
+    user_id: str = "anonymous",
+    passages: Optional[List[Dict]] = None,
+    deadline: Optional[Deadline] = None,
+    hedge: bool = True,
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Runs the agent pipeline and yields (event, data) pairs as each stage finishes.
+
+    Events are `retrieval`, `token` (one per LLM delta), `tool` and finally `done`,
+    which carries the token usage and where the answer came from (cache, the
+    error-code index or the LLM). A `diagnostics` string in the body is checked
+    for known rustc error codes alongside the query.
+    Both /agent and /agent/stream consume this. `passages` skips retrieval
+    when the caller has already retrieved (see run_agent_batch).
+
+    With a `deadline`, retrieval, the debugger tool and the LLM each run under
+    their slice of it and degrade instead of failing when it runs out: no
+    passages, a skipped tool event, or a retrieval-only / truncated answer
+    (`degraded` in the done event). Requests sharing a flight run under the
+    deadline of whoever started it.
+
+    `hedge` races a second LLM backend when the first is slow to start; it
+    is for interactive requests only (run_agent_batch turns it off).
+    """
+    user_query = query_data.get("query", "No query provided")
+    code = query_data.get("code")
+    diagnostics = query_data.get("diagnostics")
+    day_index = parse_day_index(query_data)
+    error_codes = known_codes(user_query, diagnostics if isinstance(diagnostics, str) else None)
+
+    version = corpus_version()
+    response_cache.bind_version(version)
+    semantic_cache.bind_version(version)
+    cache_key = response_cache_key(user_query, day_index, code, version)
+    flight_key = f"{cache_key}|{','.join(error_codes)}" if error_codes else cache_key
+
+    # Concurrent requests with the same key (a cohort on the same lesson)
+    # share one retrieval + LLM run instead of each paying for their own.
+    # The tokens are charged to whoever started the run.
+    async for event in agent_flights.stream(
+        flight_key, lambda: _answer_events(
+            user_query, day_index, code, cache_key, user_id, passages, error_codes, deadline, hedge
+        )
+    ):
+        yield event
+
+
+async def _answer_events(
+    user_query: str,
+    day_index: Optional[int],
+    code: Optional[str],
+    cache_key: str,
+    user_id: str,
+    passages: Optional[List[Dict]] = None,
+    error_codes: Sequence[str] = (),
+    deadline: Optional[Deadline] = None,
+    hedge: bool = True,
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """Retrieval, cache lookups and the LLM call for one (possibly shared) request."""
+    # 1. Retrieve lesson context (Memory/RAG). Off the event loop, so the
+    # stage timeout can stop waiting; out of time means answering without it.
+    if passages is None:
+        passages = await run_stage(
+            deadline, "retrieval", asyncio.to_thread(retrieve_context, user_query, day_index), []
+        )
+    yield "retrieval", {"passages": passages, "context_tokens": sum(p["tokens"] for p in passages)}
+
+    # 3. If code submitted, call Debugger Tool. It runs as a background job
+    # (compile + clippy + explanation) alongside the LLM answer below.
+    if code:
+        yield "tool", await run_stage(deadline, "tool", _debugger_tool_event(code, user_id), {
+            "tool": "debugger",
+            "status": "skipped",
+            "detail": "Code analysis could not be started within the request deadline.",
+        })
+
+    # A known rustc error code in the question or pasted diagnostics is
+    # answered from the offline error index, no LLM call.
+    if error_codes:
+        answer_paths["error_index"] += 1
+        yield "token", {"text": answer_for_codes(list(error_codes))}
+        yield "done", {"tokens_used": 0, "usage": {}, "cached": False, "source": "error_index", "error_codes": list(error_codes)}
+        return
+
+    # Identical question on the same lesson: replay the stored answer, no LLM call.
+    # Failing that, a paraphrase of an earlier question on the same day will do,
+    # unless code was submitted (those answers are specific to the code).
+    source = "exact_cache"
+    cached = response_cache.get(cache_key)
+    if cached is None and not code:
+        source = "semantic_cache"
+        cached = semantic_cache.get(user_query, day_index)
+        if cached is not None:
+            response_cache.set(cache_key, cached)
+    if cached is not None:
+        answer_paths[source] += 1
+        yield "token", {"text": cached["text"]}
+        yield "done", {"tokens_used": 0, "usage": {}, "cached": True, "source": source}
+        return
+
+    # 2. Call LLM with context, within whatever is left of the deadline
+    parts: List[str] = []
+    usage: Dict = {}
+    model = llm.DEFAULT_MODEL
+    source = "llm"
+    if llm.is_configured():
+        messages = prompt_templates.build_messages(day_index, passages, user_query, code)
+        prompt_estimate = estimate_messages_tokens(messages)
+        # Held against the learner's budget until the real usage is known, so
+        # concurrent requests can't all pass the check before any is recorded
+        reservation = token_meter.reserve(user_id, prompt_estimate)
+        try:
+            try:
+                async with deadline.timeout("llm") if deadline else contextlib.nullcontext():
+                    async for chunk in llm.stream_chat(messages, hedge=hedge):
+                        model = chunk.model or model
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield "token", {"text": chunk.text}
+                        if chunk.usage:
+                            usage = chunk.usage
+            except TimeoutError:
+                stage_timeouts["llm"] += 1
+                source = "llm_truncated" if parts else "retrieval_fallback"
+                note = _TRUNCATED_NOTE if parts else retrieval_only_answer(passages)
+                parts.append(note)
+                yield "token", {"text": note}
+        finally:
+            # Also settles a stream the client abandoned: the provider still
+            # charged for it
+            if not usage:
+                # Provider didn't report usage: fall back to the local estimate
+                completion_estimate = estimate_tokens("".join(parts))
+                usage = {
+                    "prompt_tokens": prompt_estimate,
+                    "completion_tokens": completion_estimate,
+                    "total_tokens": prompt_estimate + completion_estimate,
+                    "estimated": True,
+                }
+            usage["estimated_prompt_tokens"] = prompt_estimate
+            prompt_templates.record_usage(usage)
+            token_meter.settle(reservation, usage["prompt_tokens"], usage["completion_tokens"], model)
+    else:
+        # No provider configured (local dev): keep the old placeholder answer,
+        # labelled as such so it is never cached or counted as an LLM answer.
+        source = "placeholder"
+        parts.append(f"Processing query: '{user_query}'. This response comes from the FastAPI Agent!")
+        yield "token", {"text": parts[-1]}
+
+    # Only complete answers are cached; a stream cut short never gets here
+    # and a degraded one is not worth replaying. Neither is the placeholder,
+    # which would outlive a provider being configured.
+    degraded = source not in ("llm", "placeholder")
+    if source == "llm":
+        answer = {"text": "".join(parts)}
+        response_cache.set(cache_key, answer)
+        if not code:
+            semantic_cache.set(user_query, day_index, answer)
+    answer_paths[source] += 1
+    yield "done", {
+        "tokens_used": usage.get("total_tokens", 0),
+        "usage": usage,
+        "cached": False,
+        "source": source,
+        "degraded": degraded,
+    }
+
+
+_TRUNCATED_NOTE = "\n\n_(Answer cut short: the response deadline was reached.)_"
+
+
+def retrieval_only_answer(passages: List[Dict]) -> str:
+    """Degraded answer when the LLM produced nothing in time: point at the lesson text."""
+    if not passages:
+        return "Sorry, I couldn't put an answer together in time. Please try again."
+    lines = ["I ran out of time to write a full answer, but these parts of the lessons cover your question:"]
+    for passage in passages[:3]:
+        excerpt = " ".join(passage["text"].split())
+        if len(excerpt) > 240:
+            excerpt = excerpt[:240].rsplit(" ", 1)[0] + " …"
+        lines.append(f"- Day {passage['day_index']}, {passage['title']} ({passage['section']}): {excerpt}")
+    return "\n".join(lines)
+
+
+async def _debugger_tool_event(code: str, user_id: str) -> Dict:
+    """Submits the code for analysis and describes the job for the client to follow."""
+    try:
+        job = await submit_debug_job(code, user_id)
+    except Exception as e:
+        return {"tool": "debugger", "status": "failed", "detail": str(e)}
+    return {
+        "tool": "debugger",
+        "status": job["status"],
+        "job_id": job["id"],
+        "poll_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+
+
+async def run_agent_pipeline(
+    query_data: Dict,
+    user_id: str = "anonymous",
+    passages: Optional[List[Dict]] = None,
+    deadline: Optional[Deadline] = None,
+    hedge: bool = True,
+) -> Dict:
+    """Runs the pipeline to completion and returns the classic /agent response."""
+    parts: List[str] = []
+    tool_events: List[Dict] = []
+    tokens_used = 0
+    cached = False
+    degraded = False
+    async for event, data in agent_events(query_data, user_id, passages, deadline, hedge):
+        if event == "token":
+            parts.append(data["text"])
+        elif event == "tool":
+            tool_events.append(data)
+        elif event == "done":
+            tokens_used = data["tokens_used"]
+            cached = data["cached"]
+            degraded = data.get("degraded", False)
+    return {
+        "status": "success",
+        "agent_response": "".join(parts),
+        "tool_events": tool_events,
+        "tokens_used": tokens_used,
+        "cached": cached,
+        "degraded": degraded,
+    }
+
+
+async def run_agent_batch(
+    items: List[Dict], user_id: str = "anonymous", deadline: Optional[Deadline] = None
+) -> List[Dict]:
+    """
+    Answers many queries at once: retrieval for all of them in one vectorized
+    pass, then the LLM calls fanned out under BATCH_CONCURRENCY. Results keep
+    the input order, and a failing item reports its error without failing
+    the others. Every item shares the one `deadline`.
+
+    Each item goes through admission control like a single /agent request:
+    it takes a token from the user's bucket and a global LLM slot, and an
+    item that is refused reports the rate limit as its error.
+    """
+    passages = await run_stage(
+        deadline,
+        "retrieval",
+        asyncio.to_thread(
+            retrieve_context_batch,
+            [item.get("query", "No query provided") for item in items],
+            [parse_day_index(item) for item in items],
+        ),
+        [[] for _ in items],
+    )
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def answer(item: Dict, item_passages: List[Dict]) -> Dict:
+        async with semaphore:
+            try:
+                slot = await rate_limiter.admit(user_id)
+            except RateLimited as e:
+                return {"status": "error", "detail": e.detail, "retry_after": e.retry_after}
+            try:
+                # Not interactive: a slow backend is worth waiting for, not paying twice
+                return await run_agent_pipeline(item, user_id, item_passages, deadline, hedge=False)
+            except Exception as e:
+                return {"status": "error", "detail": str(e)}
+            finally:
+                slot.release()
+
+    return await asyncio.gather(*(answer(item, p) for item, p in zip(items, passages)))
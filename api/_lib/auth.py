@@ -0,0 +1,45 @@
+# learn-rust-production-repo/api/_lib/auth.py
+
+import os
+from typing import Optional
+
+from fastapi import Request
+
+# HS256 secret from Supabase (Project Settings -> API -> JWT Secret)
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+# Header carrying the client address, set by the platform's edge (which
+# overwrites whatever the client sent). Vercel's is trusted when running
+# there; anywhere else the socket address is used unless this is set.
+# X-Forwarded-For is never trusted as-is: clients can put anything in it.
+CLIENT_IP_HEADER = os.environ.get("CLIENT_IP_HEADER", "x-vercel-forwarded-for" if os.environ.get("VERCEL") else "")
+
+
+def _verified_subject(token: str) -> Optional[str]:
+    """Returns the Supabase user id (`sub`) from a verified access token, or None."""
+    if not SUPABASE_JWT_SECRET:
+        return None
+    import jwt  # PyJWT, only needed for signed-in requests
+
+    try:
+        claims = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+    except jwt.PyJWTError:
+        return None
+    return claims.get("sub")
+
+
+def get_user_id(request: Request) -> str:
+    """
+    Identifies the caller for budgets and rate limits.
+
+    Signed-in learners are keyed by their Supabase user id. Anything we
+    can't verify falls back to the client address, so a forged token
+    can't borrow someone else's budget (see CLIENT_IP_HEADER).
+    """
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        user_id = _verified_subject(header[7:].strip())
+        if user_id:
+            return user_id
+    forwarded = request.headers.get(CLIENT_IP_HEADER, "") if CLIENT_IP_HEADER else ""
+    client = forwarded.split(",")[0].strip() or (request.client.host if request.client else "unknown")
+    return f"anon:{client}"
@@ -0,0 +1,123 @@
+# learn-rust-production-repo/api/_lib/bench_coldstart.py
+#
+# Reproducible cold-start benchmark for the Vercel function in api/index.py.
+# Every sample runs in a fresh interpreter, so nothing is warm.
+#
+# Usage (from the repo root):
+#   python -m api._lib.bench_coldstart            # 5 runs per measurement
+#   python -m api._lib.bench_coldstart --runs 20
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Runs inside the fresh interpreter: imports the app, sends one request
+# straight through ASGI (no server, no HTTP client) and prints timings.
+_FIRST_RESPONSE_SCRIPT = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from api.index import app
+imported = time.perf_counter()
+
+async def request(method, path, body):
+    sent = []
+    pending = [{{"type": "http.request", "body": body, "more_body": False}}]
+    async def receive():
+        if pending:
+            return pending.pop()
+        await asyncio.Event().wait()
+    async def send(message):
+        sent.append(message)
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1",
+        "method": method, "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "scheme": "http", "server": ("bench", 80), "client": ("bench", 1),
+    }}
+    await app(scope, receive, send)
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
+
+status = asyncio.run(request({method!r}, {path!r}, {body!r}))
+done = time.perf_counter()
+print(json.dumps({{"status": status, "import_ms": (imported - start) * 1000, "first_response_ms": (done - start) * 1000}}))
+"""
+
+TARGETS = {
+    "/api/status": ("GET", "/api/status", b""),
+    "/agent": ("POST", "/agent", json.dumps({"query": "why can't I assign twice?", "day_index": 2}).encode()),
+}
+
+
+def _python(args: List[str], env: Dict) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def _clean_env() -> Dict:
+    env = dict(os.environ)
+    # No provider keys: measure our own startup, not a network round trip
+    for key in ("GROQ_API_KEY", "GEMINI_API_KEY", "GOOGLE_API_KEY"):
+        env.pop(key, None)
+    return env
+
+
+def measure_imports(runs: int) -> List[Dict]:
+    """Median self/cumulative import time per module, from `python -X importtime`."""
+    samples: Dict[str, List] = {}
+    for _ in range(runs):
+        result = _python(["-X", "importtime", "-c", f"import sys; sys.path.insert(0, {str(REPO_ROOT)!r}); import api.index"], _clean_env())
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            samples.setdefault(name.strip(), []).append((int(self_us), int(cumulative_us)))
+    rows = [
+        {
+            "module": name,
+            "self_ms": statistics.median(s for s, _ in values) / 1000,
+            "cumulative_ms": statistics.median(c for _, c in values) / 1000,
+        }
+        for name, values in samples.items()
+    ]
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)
+
+
+def measure_first_response(target: str, runs: int) -> Dict:
+    method, path, body = TARGETS[target]
+    script = _FIRST_RESPONSE_SCRIPT.format(root=str(REPO_ROOT), method=method, path=path, body=body)
+    samples = [json.loads(_python(["-c", script], _clean_env()).stdout) for _ in range(runs)]
+    return {
+        "target": target,
+        "status": samples[-1]["status"],
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "first_response_ms": statistics.median(s["first_response_ms"] for s in samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for api/index.py")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="modules to list")
+    args = parser.parse_args()
+
+    print(f"Import time per module (median of {args.runs} cold runs)")
+    print(f"{'module':<50} {'self ms':>9} {'cumul ms':>9}")
+    for row in measure_imports(args.runs)[:args.top]:
+        print(f"{row['module']:<50} {row['self_ms']:>9.1f} {row['cumulative_ms']:>9.1f}")
+
+    print(f"\nTime to first response (median of {args.runs} cold runs)")
+    print(f"{'route':<15} {'status':>6} {'import ms':>10} {'first resp ms':>14}")
+    for target in TARGETS:
+        row = measure_first_response(target, args.runs)
+        print(f"{row['target']:<15} {row['status']:>6} {row['import_ms']:>10.1f} {row['first_response_ms']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# learn-rust-production-repo/api/_lib/bm25.py
+
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List
+
+from .corpus import corpus_version, lesson_passages
+from .snapshot import load_manifest
+
+# Rust-aware token pattern, tried left to right:
+#   lifetimes ('a, 'static) but not char literals ('a), quoted words ('hello')
+#   or contractions (can't), paths (String::from),
+#   macros (println!), reference modifiers (&mut, &str), arrows (-> =>), words.
+_TOKEN_RE = re.compile(
+    r"(?<!\w)'[a-z_]\w*(?![\w'])"
+    r"|[a-z_]\w*(?:::[a-z_]\w*)+"
+    r"|[a-z_]\w*!(?!=)"
+    r"|&(?:mut\b|str\b)?"
+    r"|->|=>"
+    r"|\w+"
+)
+
+# Title and topic_slug tokens are counted this many times, so a query that
+# names the lesson topic ranks that lesson above passing mentions elsewhere.
+TITLE_WEIGHT = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into search tokens, keeping Rust syntax like `&mut`,
+    `String::from`, `println!` and `'a` intact. Compound tokens also emit
+    their parts, so "string from" still matches `String::from`.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "::" in token:
+            tokens.extend(token.split("::"))
+        elif token.endswith("!") or (token.startswith("&") and len(token) > 1):
+            tokens.append(token.strip("&!"))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over lesson passages with a precomputed inverted index."""
+
+    def __init__(self, passages: List[Dict], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        # term -> list of (row, term frequency)
+        self.postings: Dict[str, List] = {}
+        self.doc_lengths: List[int] = []
+        for row, passage in enumerate(passages):
+            header = f"{passage['title']} {passage['topic_slug'].replace('-', ' ')}"
+            tokens = tokenize(header) * TITLE_WEIGHT + tokenize(passage["text"])
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((row, tf))
+        self._precompute()
+
+    @classmethod
+    def from_state(cls, passages: List[Dict], state: Dict) -> "BM25Index":
+        """Restores an index saved with to_state() without re-tokenizing the corpus."""
+        index = cls.__new__(cls)
+        index.passages = passages
+        index.k1 = state["k1"]
+        index.b = state["b"]
+        index.postings = state["postings"]
+        index.doc_lengths = state["doc_lengths"]
+        index._precompute()
+        return index
+
+    def to_state(self) -> Dict:
+        return {"k1": self.k1, "b": self.b, "postings": self.postings, "doc_lengths": self.doc_lengths}
+
+    def _precompute(self) -> None:
+        n = len(self.passages)
+        self.avg_length = sum(self.doc_lengths) / n if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in self.postings.items()
+        }
+        # Per-document length normalisation is fixed, so precompute it too
+        self.norms = [
+            self.k1 * (1 - self.b + self.b * length / self.avg_length) for length in self.doc_lengths
+        ]
+
+    def search(self, query: str, k: int = 10) -> List[Dict]:
+        """Returns up to k passages ranked by BM25 score (only those matching a query term)."""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for row, tf in self.postings[term]:
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.norms[row])
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{**self.passages[row], "score": round(score, 4)} for row, score in ranked]
+
+
+def get_bm25_index() -> BM25Index:
+    """Returns the process-wide BM25 index over lesson_passages(), rebuilt if the lessons change."""
+    return _bm25_for_version(corpus_version())
+
+
+@lru_cache(maxsize=1)
+def _bm25_for_version(version: str) -> BM25Index:
+    manifest = load_manifest(version)
+    if manifest is not None:
+        return BM25Index.from_state(manifest["passages"], manifest["bm25"])
+    return BM25Index(lesson_passages())
@@ -0,0 +1,252 @@
+# learn-rust-production-repo/api/_lib/build_cache.py
+#
+# Pre-compiled dependency artifacts and per-user incremental sessions for
+# the execution pool. Each crate set is built once with cargo into a shared
+# target directory; submissions are then compiled with plain rustc against
+# those rlibs (read-only), so only the learner's own crate is ever rebuilt.
+#
+# Prebuild every crate set at deploy time (from the repo root):
+#   python -m api._lib.build_cache
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .corpus import lessons_for_day
+
+# Shared dependency builds and incremental sessions; outlives the sandboxes
+BUILD_ROOT = Path(os.environ.get("EXEC_BUILD_DIR", Path(tempfile.gettempdir()) / "learnrust-build"))
+# Incremental sessions kept on disk; the least recently used are removed first
+MAX_SESSIONS = int(os.environ.get("EXEC_MAX_SESSIONS", "256"))
+# Cold dependency builds can take minutes; this bounds one cargo invocation
+DEPS_BUILD_TIMEOUT_SECONDS = float(os.environ.get("EXEC_DEPS_BUILD_TIMEOUT_SECONDS", "600"))
+
+# Crates a submission may use, per crate set, as Cargo.toml dependency lines.
+CRATE_SETS: Dict[str, Dict[str, str]] = {
+    "std": {},
+    "rand": {"rand": '"0.8"'},
+    "serde": {"serde": '{ version = "1", features = ["derive"] }', "serde_json": '"1"'},
+    "tokio": {"tokio": '{ version = "1", features = ["full"] }'},
+}
+
+# Lessons that need more than std, by topic_slug. Only lessons whose code
+# actually uses the crates belong here; every lesson in lessons/*.py so far
+# is std-only. These slugs are the ones planned in src/data/curriculum.ts,
+# used once those days have lessons.
+TOPIC_CRATE_SETS: Dict[str, str] = {
+    "external-crates": "rand",
+    "external-crates-rand": "rand",
+    "async-runtimes": "tokio",
+    "review-crates": "serde",
+}
+
+DEPS_CARGO_TOML = """[package]
+name = "lesson-deps"
+version = "0.1.0"
+edition = "2021"
+
+[lib]
+path = "src/lib.rs"
+
+[dependencies]
+{dependencies}
+
+[profile.dev]
+debug = 0
+incremental = false
+"""
+
+
+def crate_set_for_day(day_index: Optional[int]) -> str:
+    """Crate set allowed for a lesson day; std when the day needs no crates."""
+    for lesson in lessons_for_day(day_index):
+        crate_set = TOPIC_CRATE_SETS.get(lesson.get("topic_slug", ""))
+        if crate_set:
+            return crate_set
+    return "std"
+
+
+def _set_dir(crate_set: str) -> Path:
+    # Changing a set's dependencies builds into a fresh directory
+    digest = hashlib.sha256(json.dumps(CRATE_SETS[crate_set], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return BUILD_ROOT / "deps" / f"{crate_set}-{digest}"
+
+
+class DependencyArtifacts:
+    """rustc flags (-L dependency=..., --extern name=path) for one built crate set."""
+
+    def __init__(self, crate_set: str, deps_dir: Optional[str] = None, externs: Optional[Dict[str, str]] = None):
+        self.crate_set = crate_set
+        self.deps_dir = deps_dir
+        self.externs = externs or {}
+
+    def rustc_args(self) -> List[str]:
+        args = ["-L", f"dependency={self.deps_dir}"] if self.deps_dir else []
+        for name, path in sorted(self.externs.items()):
+            args += ["--extern", f"{name}={path}"]
+        return args
+
+    def to_state(self) -> Dict:
+        return {"crate_set": self.crate_set, "deps_dir": self.deps_dir, "externs": self.externs}
+
+
+async def _build_crate_set(crate_set: str) -> DependencyArtifacts:
+    directory = _set_dir(crate_set)
+    manifest = directory / "artifacts.json"
+    if manifest.exists():
+        return DependencyArtifacts(**json.loads(manifest.read_text(encoding="utf-8")))
+
+    cargo = shutil.which("cargo")
+    if cargo is None:
+        raise RuntimeError("cargo is not installed on this host.")
+    dependencies = CRATE_SETS[crate_set]
+    (directory / "src").mkdir(parents=True, exist_ok=True)
+    (directory / "src" / "lib.rs").write_text("", encoding="utf-8")
+    (directory / "Cargo.toml").write_text(
+        DEPS_CARGO_TOML.format(dependencies="\n".join(f"{name} = {spec}" for name, spec in dependencies.items())),
+        encoding="utf-8",
+    )
+    process = await asyncio.create_subprocess_exec(
+        cargo, "build", "--quiet", "--message-format=json",
+        cwd=directory,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), DEPS_BUILD_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise RuntimeError(f"Building the '{crate_set}' crate set timed out.")
+    if process.returncode != 0:
+        raise RuntimeError(f"Building the '{crate_set}' crate set failed: {stderr.decode('utf-8', 'replace')[-2000:]}")
+
+    # Direct dependencies become --extern flags; everything else is found via -L
+    wanted = {name.replace("-", "_") for name in dependencies}
+    externs = {}
+    for line in stdout.decode("utf-8", "replace").splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("reason") != "compiler-artifact":
+            continue
+        name = message["target"]["name"].replace("-", "_")
+        if name in wanted and "proc-macro" not in message["target"]["kind"]:
+            rlibs = [path for path in message["filenames"] if path.endswith(".rlib")]
+            if rlibs:
+                externs[name] = rlibs[0]
+    artifacts = DependencyArtifacts(crate_set, str(directory / "target" / "debug" / "deps"), externs)
+    manifest.write_text(json.dumps(artifacts.to_state()), encoding="utf-8")
+    return artifacts
+
+
+def _built(build: asyncio.Task) -> bool:
+    return build.done() and not build.cancelled() and build.exception() is None
+
+
+def _retrieve_exception(build: asyncio.Task) -> None:
+    # Failures surface through stats() and retries; don't log them as unretrieved
+    if not build.cancelled():
+        build.exception()
+
+
+class BuildCache:
+    """
+    Builds each crate set at most once per host and hands out incremental
+    session directories per (user, crate set). Sessions let a re-run after a
+    small edit reuse rustc's query cache for the unchanged parts of the crate.
+    """
+
+    def __init__(self, root: Path = BUILD_ROOT, max_sessions: int = MAX_SESSIONS):
+        self.root = root
+        self.max_sessions = max_sessions
+        self._builds: Dict[str, asyncio.Task] = {}
+        self.sessions_created = 0
+        self.sessions_evicted = 0
+        # Requests that ran against std because their crate set wasn't built yet
+        self.fallbacks = 0
+
+    async def artifacts(self, crate_set: str, wait: bool = False) -> DependencyArtifacts:
+        """
+        Artifacts of `crate_set`. A set that isn't built yet is never built
+        inside a request: its build starts in the background and std is used
+        meanwhile (check `.crate_set`). Only prebuilding passes wait=True.
+        """
+        if crate_set not in CRATE_SETS:
+            raise ValueError(f"Unknown crate set '{crate_set}'.")
+        if not CRATE_SETS[crate_set]:
+            return DependencyArtifacts(crate_set)
+        build = self._start_build(crate_set)
+        if wait:
+            return await asyncio.shield(build)
+        if not build.done():
+            # Sets prebuilt at deploy time only need their artifacts.json read
+            await asyncio.sleep(0)
+        if _built(build):
+            return build.result()
+        self.fallbacks += 1
+        return DependencyArtifacts("std")
+
+    def prebuild(self) -> None:
+        """Starts building every crate set in the background; call at startup."""
+        for crate_set, dependencies in CRATE_SETS.items():
+            if dependencies:
+                self._start_build(crate_set)
+
+    def _start_build(self, crate_set: str) -> asyncio.Task:
+        build = self._builds.get(crate_set)
+        if build is None or (build.done() and not _built(build)):
+            # A failed build is retried by the next request that needs the set
+            build = asyncio.get_running_loop().create_task(_build_crate_set(crate_set))
+            build.add_done_callback(_retrieve_exception)
+            self._builds[crate_set] = build
+        return build
+
+    def session_dir(self, user_id: str, crate_set: str) -> Path:
+        """Incremental compilation directory for this user; created on first use."""
+        name = hashlib.sha256(f"{user_id}\0{crate_set}".encode("utf-8")).hexdigest()[:16]
+        sessions = self.root / "sessions"
+        path = sessions / name
+        if not path.exists():
+            path.mkdir(parents=True, exist_ok=True)
+            self.sessions_created += 1
+            self._evict(sessions)
+        else:
+            # mtime marks recent use for eviction
+            os.utime(path)
+        return path
+
+    def _evict(self, sessions: Path) -> None:
+        entries = sorted(sessions.iterdir(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: max(0, len(entries) - self.max_sessions)]:
+            shutil.rmtree(entry, ignore_errors=True)
+            self.sessions_evicted += 1
+
+    def stats(self) -> Dict:
+        return {
+            "crate_sets_built": sorted(name for name, build in self._builds.items() if _built(build)),
+            "sessions_created": self.sessions_created,
+            "sessions_evicted": self.sessions_evicted,
+            "fallbacks": self.fallbacks,
+        }
+
+
+build_cache = BuildCache()
+
+
+async def _prebuild_all() -> None:
+    for crate_set in CRATE_SETS:
+        started = time.monotonic()
+        artifacts = await build_cache.artifacts(crate_set, wait=True)
+        print(f"{crate_set}: {len(artifacts.externs)} crates in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(_prebuild_all())
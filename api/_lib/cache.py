@@ -0,0 +1,99 @@
+# learn-rust-production-repo/api/_lib/cache.py
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Response cache limits, overridable per deployment
+RESPONSE_CACHE_SIZE = int(os.environ.get("AGENT_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("AGENT_CACHE_TTL_SECONDS", "3600"))
+
+
+class TTLCache:
+    """
+    Bounded LRU cache where every entry also expires after `ttl` seconds.
+
+    Entries are tagged with a version (e.g. the lesson corpus hash); when a
+    different version is bound, everything cached so far is dropped.
+    Not thread-safe: it is only touched from the event loop.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def bind_version(self, version: str) -> None:
+        """Clears the cache if `version` differs from the one entries were stored under."""
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "version": self.version,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation."""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+def response_cache_key(query: str, day_index: Optional[int], code: Optional[str], version: str) -> str:
+    """Cache key for one agent answer: normalized query + lesson context + corpus version."""
+    payload = json.dumps([normalize_query(query), day_index, (code or "").strip(), version])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Exact-match cache of final agent answers, shared by /agent and /agent/stream
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
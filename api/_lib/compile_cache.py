@@ -0,0 +1,181 @@
+# learn-rust-production-repo/api/_lib/compile_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Results live in a small SQLite file; /tmp is the writable place on Vercel
+COMPILE_CACHE_PATH = os.environ.get(
+    "EXEC_CACHE_DB", str(Path(tempfile.gettempdir()) / "learnrust-compile-cache.db")
+)
+# Total size of stored results before least-recently-used entries are evicted
+COMPILE_CACHE_MAX_BYTES = int(os.environ.get("EXEC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_toolchain: Optional[str] = None
+
+
+async def toolchain_version() -> str:
+    """`rustc --version` of the host toolchain, read once per process."""
+    global _toolchain
+    if _toolchain is None:
+        rustc = shutil.which("rustc")
+        if rustc is None:
+            return "unknown"
+        process = await asyncio.create_subprocess_exec(
+            rustc, "--version", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        _toolchain = stdout.decode("utf-8", "replace").strip() or "unknown"
+    return _toolchain
+
+
+def normalize_source(code: str) -> str:
+    """
+    Line endings, trailing whitespace and trailing blank lines never change
+    what rustc produces, so they are stripped before hashing. Everything
+    else is kept: diagnostics quote line and column numbers.
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n") + "\n"
+
+
+def compile_cache_key(code: str, stdin: str, toolchain: str, limits: Dict, crate_set: str = "std") -> str:
+    material = json.dumps(
+        {
+            "code": normalize_source(code),
+            "stdin": stdin,
+            "toolchain": toolchain,
+            "limits": limits,
+            "crate_set": crate_set,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(result: Dict) -> bool:
+    """Wall-clock timeouts depend on host load, so those results are not reused."""
+    if result["compile"]["timed_out"]:
+        return False
+    return result["run"] is None or not result["run"]["timed_out"]
+
+
+class CompileCache:
+    """
+    Content-addressed store of execution results (diagnostics, stdout,
+    stderr, exit status), bounded by total size with LRU eviction.
+    Shared by every worker process on the host through SQLite; the running
+    entry count and size live in the file too, so no call scans the table.
+
+    get/set are async and run in a worker thread (one connection per
+    thread); stats() is sync, for the threadpool-run metrics route.
+    """
+
+    def __init__(self, path: str = COMPILE_CACHE_PATH, max_bytes: int = COMPILE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " entries INTEGER NOT NULL, size INTEGER NOT NULL)"
+            )
+            # Files from before the totals table are counted once
+            conn.execute(
+                "INSERT OR IGNORE INTO totals (id, entries, size)"
+                " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            )
+            self._local.conn = conn
+        return conn
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Dict) -> None:
+        await asyncio.to_thread(self._set, key, value)
+
+    def _get(self, key: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: Dict) -> None:
+        encoded = json.dumps(value)
+        if len(encoded) > self.max_bytes:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time()),
+            )
+            conn.execute(
+                "UPDATE totals SET entries = entries + ?, size = size + ? WHERE id = 0",
+                (0 if old else 1, len(encoded) - (old[0] if old else 0)),
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest first, through the last_used index, only as far as needed
+        doomed, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+            if total - freed <= self.max_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+        conn.execute(
+            "UPDATE totals SET entries = entries - ?, size = size - ? WHERE id = 0", (len(doomed), freed)
+        )
+        self.evictions += len(doomed)
+
+    def stats(self) -> Dict:
+        entries, size = self._connect().execute("SELECT entries, size FROM totals WHERE id = 0").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+compile_cache = CompileCache()
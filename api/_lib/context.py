@@ -0,0 +1,77 @@
+# learn-rust-production-repo/api/_lib/context.py
+
+import os
+import re
+from typing import Dict, List, Optional, Set
+
+from .corpus import SECTION_FIELDS
+from .metering import estimate_tokens
+
+# Hard cap on retrieved-passage tokens per prompt. The day's system prefix
+# (instructions plus that day's full lesson, see prompts.py) comes on top.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("AGENT_CONTEXT_TOKENS", "1200"))
+# Passages sharing more than this fraction of word 3-grams count as duplicates
+DUPLICATE_JACCARD = 0.5
+# Passages scoring below this fraction of the best one are not worth their tokens
+MIN_RELATIVE_SCORE = 0.5
+
+_WORD_RE = re.compile(r"\w+")
+_SECTION_ORDER = {section: i for i, section in enumerate(SECTION_FIELDS)}
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = _WORD_RE.findall(text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def pack_context(
+    passages: List[Dict], budget: int = CONTEXT_TOKEN_BUDGET, day_index: Optional[int] = None
+) -> List[Dict]:
+    """
+    Chooses which retrieved passages go into the prompt.
+
+    Passages from `day_index` are dropped first: that day's whole lesson is
+    already in the system prefix, so they would only use up the budget.
+
+    Passages are taken greedily by relevance per token until `budget` is
+    spent, ignoring weak matches (below MIN_RELATIVE_SCORE of the best).
+    A passage is skipped when an already chosen one covers the same topic
+    section (days 3 and 6 both teach data types) or mostly the same text.
+    The result is sorted by lesson position, not score, so the same set of
+    passages always renders as the same bytes.
+
+    `budget` bounds the retrieved passages only, not the whole prompt: the
+    full-day system prefix is sent on top of it, and the token budget check
+    counts both (see agent.check_token_budget).
+    """
+    passages = [p for p in passages if day_index is None or p["day_index"] != day_index]
+    if not passages:
+        return []
+    floor = max(p["score"] for p in passages) * MIN_RELATIVE_SCORE
+    candidates = [{**p, "tokens": estimate_tokens(p["text"])} for p in passages if p["score"] >= floor]
+    candidates.sort(key=lambda p: (p["score"] / max(p["tokens"], 1), p["score"]), reverse=True)
+
+    chosen: List[Dict] = []
+    chosen_shingles: List[Set] = []
+    seen_sections = set()
+    remaining = budget
+    for passage in candidates:
+        if passage["tokens"] > remaining:
+            continue
+        section_key = (passage["topic_slug"], passage["section"])
+        if section_key in seen_sections:
+            continue
+        shingles = _shingles(passage["text"])
+        if any(_jaccard(shingles, other) > DUPLICATE_JACCARD for other in chosen_shingles):
+            continue
+        chosen.append(passage)
+        chosen_shingles.append(shingles)
+        seen_sections.add(section_key)
+        remaining -= passage["tokens"]
+
+    chosen.sort(key=lambda p: (p["day_index"], _SECTION_ORDER.get(p["section"], 99), p["id"]))
+    return chosen
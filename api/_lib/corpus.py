@@ -0,0 +1,118 @@
+# learn-rust-production-repo/api/_lib/corpus.py
+
+import hashlib
+import importlib.util
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# The lesson modules live next to the upload scripts in /lessons.
+LESSONS_DIR = Path(__file__).resolve().parents[2] / "lessons"
+
+# Every module that exports a LESSONS list, in curriculum order.
+LESSON_MODULES = ("lesson_data", "lessons_6_12", "lessons_13_20", "lessons_21_30")
+
+
+def _load_module(name: str):
+    """Loads a lesson module by file path so /lessons doesn't need to be on sys.path."""
+    spec = importlib.util.spec_from_file_location(f"lessons_{name}", LESSONS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _files_signature() -> Tuple:
+    """(name, mtime, size) of every lesson module; a few stat calls, cheap enough per request."""
+    signature = []
+    for name in LESSON_MODULES:
+        stat = os.stat(LESSONS_DIR / f"{name}.py")
+        signature.append((name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def load_lessons() -> List[Dict]:
+    """
+    Returns every lesson from the lesson modules, tagged with its source module.
+    The modules are re-read when any of their files changes on disk.
+
+    Some days appear in more than one module (e.g. days 11 and 12), so callers
+    should not assume day_index is unique.
+    """
+    return _load_lessons(_files_signature())
+
+
+@lru_cache(maxsize=1)
+def _load_lessons(signature: Tuple) -> List[Dict]:
+    lessons = []
+    for name in LESSON_MODULES:
+        for lesson in _load_module(name).LESSONS:
+            lessons.append({**lesson, "source": name})
+    return lessons
+
+
+def lessons_for_day(day_index: Optional[int]) -> List[Dict]:
+    """Returns all lessons for a given day (empty if day_index is None or unknown)."""
+    if day_index is None:
+        return []
+    return [lesson for lesson in load_lessons() if lesson["day_index"] == day_index]
+
+
+def corpus_version() -> str:
+    """Content hash of the loaded lessons; changes whenever any lesson text changes."""
+    return _corpus_version(_files_signature())
+
+
+@lru_cache(maxsize=1)
+def _corpus_version(signature: Tuple) -> str:
+    payload = json.dumps(_load_lessons(signature), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Fields that make up each section's text, across the three lesson schemas
+# (days 1-5 use task/hint/reason, 6-12 errorHint/instructions, 11-30 explanation).
+SECTION_FIELDS = {
+    "theory": (),
+    "core_example": ("explanation", "code"),
+    "pitfall_example": ("reason", "errorHint", "explanation", "code"),
+    "challenge": ("task", "instructions", "hint", "template", "expectedOutput", "expected_output"),
+}
+
+
+def section_text(lesson: Dict, section: str) -> str:
+    """Flattens one lesson section (e.g. pitfall_example) to plain text."""
+    value = lesson.get(section)
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, dict):
+        return ""
+    return "\n\n".join(value[field] for field in SECTION_FIELDS[section] if value.get(field))
+
+
+def lesson_passages() -> List[Dict]:
+    """
+    Splits every lesson into section-level passages (theory, core_example,
+    pitfall_example, challenge). Retrieval indexes are built over this list,
+    so a passage's position in it is its row id.
+    """
+    return _lesson_passages(_files_signature())
+
+
+@lru_cache(maxsize=1)
+def _lesson_passages(signature: Tuple) -> List[Dict]:
+    passages = []
+    for lesson in _load_lessons(signature):
+        for section in SECTION_FIELDS:
+            text = section_text(lesson, section)
+            if not text:
+                continue
+            passages.append({
+                "id": f"{lesson['source']}:{lesson['day_index']}:{section}",
+                "day_index": lesson["day_index"],
+                "title": lesson["title"],
+                "topic_slug": lesson["topic_slug"],
+                "section": section,
+                "text": text,
+            })
+    return passages
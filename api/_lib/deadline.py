@@ -0,0 +1,103 @@
+# learn-rust-production-repo/api/_lib/deadline.py
+
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Any, Awaitable, Dict, Optional
+
+# End-to-end budget for one /agent request when the client doesn't send one
+DEFAULT_DEADLINE_SECONDS = float(os.environ.get("AGENT_DEADLINE_SECONDS", "25"))
+# Client-requested budgets are clamped to this range
+MIN_DEADLINE_SECONDS = 1.0
+MAX_DEADLINE_SECONDS = 60.0
+# Header carrying the client's budget, in milliseconds
+DEADLINE_HEADER = "x-deadline-ms"
+
+# Share of the whole budget each stage may use at most. The LLM is last and
+# simply gets whatever is left.
+STAGE_SHARES = {"retrieval": 0.15, "tool": 0.10}
+
+# How often client disconnects are checked for non-streaming responses
+DISCONNECT_POLL_SECONDS = 0.25
+
+# Stage -> how many times it ran out of time (for /api/metrics)
+stage_timeouts: Counter = Counter()
+disconnects: Counter = Counter()
+
+
+class Deadline:
+    """
+    A request's remaining time budget. Stages take their slice with
+    `timeout(stage)`, which never extends past the overall deadline.
+    """
+
+    def __init__(self, seconds: float = DEFAULT_DEADLINE_SECONDS):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_headers(cls, headers) -> "Deadline":
+        """Reads X-Deadline-Ms, falling back to the default budget."""
+        try:
+            seconds = float(headers.get(DEADLINE_HEADER)) / 1000
+        except (TypeError, ValueError):
+            return cls()
+        return cls(min(MAX_DEADLINE_SECONDS, max(MIN_DEADLINE_SECONDS, seconds)))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def slice(self, stage: str) -> float:
+        """Seconds `stage` may take: its share of the budget, capped by what is left."""
+        share = STAGE_SHARES.get(stage)
+        if share is None:
+            return self.remaining()
+        return min(self.budget * share, self.remaining())
+
+    def timeout(self, stage: str):
+        """asyncio.timeout context for one stage."""
+        return asyncio.timeout(self.slice(stage))
+
+
+async def run_stage(deadline: Optional[Deadline], stage: str, awaitable: Awaitable, fallback: Any) -> Any:
+    """Awaits `awaitable` within the stage's slice; returns `fallback` if it runs out."""
+    if deadline is None:
+        return await awaitable
+    try:
+        async with deadline.timeout(stage):
+            return await awaitable
+    except TimeoutError:
+        stage_timeouts[stage] += 1
+        return fallback
+
+
+async def cancel_on_disconnect(request, awaitable: Awaitable) -> Any:
+    """
+    Runs `awaitable` and cancels it if the client disconnects first, so an
+    abandoned non-streaming request stops paying for LLM tokens. Returns
+    None when cancelled that way. (Streaming responses are cancelled by
+    Starlette itself when the connection drops.)
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                disconnects[request.url.path] += 1
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def deadline_stats() -> Dict:
+    return {
+        "default_seconds": DEFAULT_DEADLINE_SECONDS,
+        "stage_timeouts": dict(stage_timeouts),
+        "client_disconnects": dict(disconnects),
+    }
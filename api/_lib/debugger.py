@@ -0,0 +1,182 @@
+# learn-rust-production-repo/api/_lib/debugger.py
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import llm
+from .executor import DEFAULT_LIMITS, jail_command, own_sandbox_dir, run_limited, rustc_toolchain, sandbox_env
+from .jobs import job_queue
+from .metering import TokenBudgetExceeded, estimate_messages_tokens, estimate_tokens, token_meter
+
+logger = logging.getLogger(__name__)
+
+# Give up on a single compiler/clippy invocation after this many seconds
+ANALYSIS_TIMEOUT_SECONDS = float(os.environ.get("DEBUGGER_TIMEOUT_SECONDS", "20"))
+# Learner code larger than this is rejected outright
+MAX_CODE_BYTES = 64 * 1024
+# Diagnostics included in the LLM explanation prompt
+MAX_DIAGNOSTICS_EXPLAINED = 5
+
+EXPLAIN_PROMPT = (
+    "You are a friendly Rust tutor. A learner's code produced the compiler and clippy "
+    "diagnostics below. Explain the most important problem in plain words and show the fix."
+)
+
+
+def analysis_key(code: str, user_id: str) -> str:
+    """
+    Identical submissions from one user share one analysis job. Jobs aren't
+    shared across users: the explanation is metered to the submitter.
+    """
+    return hashlib.sha256(f"{user_id}\0{code.strip()}".encode("utf-8")).hexdigest()
+
+
+async def _checker() -> List[str]:
+    # clippy-driver is a rustc wrapper: one run gives compiler errors *and* lints.
+    # --emit=metadata stops before codegen, which is all a check needs.
+    # Both are called from the toolchain directly, as in the executor's sandbox.
+    rustc, sysroot = await rustc_toolchain()
+    clippy = sysroot / "bin" / "clippy-driver"
+    tool = str(clippy) if clippy.exists() else rustc
+    return [
+        tool, "--sysroot", str(sysroot), "--edition", "2021", "--crate-type", "bin",
+        "--error-format=json", "--emit=metadata",
+    ]
+
+
+def _parse_diagnostics(stderr: str) -> List[Dict]:
+    diagnostics = []
+    for line in stderr.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("$message_type", "diagnostic") != "diagnostic" or message.get("level") not in ("error", "warning"):
+            continue
+        # Summary lines like "aborting due to 2 previous errors" carry no span
+        if not message.get("spans"):
+            continue
+        span = next((s for s in message["spans"] if s.get("is_primary")), message["spans"][0])
+        diagnostics.append({
+            "level": message["level"],
+            "code": (message.get("code") or {}).get("code"),
+            "message": message["message"],
+            "line": span["line_start"],
+            "column": span["column_start"],
+            "rendered": message.get("rendered"),
+        })
+    return diagnostics
+
+
+async def check_code(code: str) -> Dict:
+    """
+    Compiles `code` with clippy (metadata only) and returns its diagnostics.
+    Runs like an executor compile: jailed, with a scrubbed environment (no
+    env!() access to server secrets) and the same rlimits.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="learnrust-debug-"))
+    try:
+        own_sandbox_dir(workdir)
+        (workdir / "main.rs").write_text(code, encoding="utf-8")
+        _, sysroot = await rustc_toolchain()
+        command = await _checker() + ["-o", "main", "main.rs"]
+        env = sandbox_env(workdir)
+        result = await run_limited(
+            jail_command(command, workdir, env, readable=[sysroot]),
+            workdir,
+            env=env,
+            wall_seconds=ANALYSIS_TIMEOUT_SECONDS,
+            cpu_seconds=int(ANALYSIS_TIMEOUT_SECONDS),
+            memory_mb=DEFAULT_LIMITS.compile_memory_mb,
+            # Diagnostics come as JSON lines, which need more room than plain output
+            output_bytes=DEFAULT_LIMITS.output_bytes * 4,
+            file_bytes=DEFAULT_LIMITS.compile_file_mb * 1024 * 1024,
+            processes=DEFAULT_LIMITS.compile_processes,
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result["timed_out"]:
+        raise RuntimeError(f"Code analysis timed out after {ANALYSIS_TIMEOUT_SECONDS:.0f}s.")
+
+    diagnostics = _parse_diagnostics(result["stderr"])
+    return {
+        "tool": Path(command[0]).name,
+        "compiled": result["exit_code"] == 0,
+        "errors": sum(d["level"] == "error" for d in diagnostics),
+        "warnings": sum(d["level"] == "warning" for d in diagnostics),
+        "diagnostics": diagnostics,
+        "duration_ms": result["duration_ms"],
+    }
+
+
+async def explain_diagnostics(code: str, diagnostics: List[Dict], user_id: str = "anonymous") -> Optional[str]:
+    """
+    Asks the LLM to explain the diagnostics, or returns None if there is
+    nothing to explain. The call is reserved against and metered to
+    `user_id`'s daily budget like an agent answer (TokenBudgetExceeded).
+    """
+    if not diagnostics or not llm.is_configured():
+        return None
+    rendered = "\n".join(d["rendered"] or d["message"] for d in diagnostics[:MAX_DIAGNOSTICS_EXPLAINED])
+    messages = [
+        {"role": "system", "content": EXPLAIN_PROMPT},
+        {"role": "user", "content": f"```rust\n{code}\n```\n\nDiagnostics:\n{rendered}"},
+    ]
+    reservation = token_meter.reserve(user_id, estimate_messages_tokens(messages))
+    parts: List[str] = []
+    usage: Dict = {}
+    model = llm.DEFAULT_MODEL
+    try:
+        async for chunk in llm.stream_chat(messages):
+            model = chunk.model or model
+            if chunk.text:
+                parts.append(chunk.text)
+            if chunk.usage:
+                usage = chunk.usage
+    finally:
+        token_meter.settle(
+            reservation,
+            usage.get("prompt_tokens", reservation.tokens),
+            usage.get("completion_tokens", estimate_tokens("".join(parts))),
+            model,
+        )
+    return "".join(parts)
+
+
+async def run_debugger_job(payload: Dict) -> Dict:
+    """Job handler for kind "debug": compile + clippy, then an LLM explanation."""
+    code = payload["code"]
+    result = await check_code(code)
+    try:
+        result["explanation"] = await explain_diagnostics(
+            code, result["diagnostics"], payload.get("user_id", "anonymous")
+        )
+    except TokenBudgetExceeded as e:
+        # The diagnostics are still worth returning without the explanation
+        result["explanation"] = None
+        result["explanation_skipped"] = str(e)
+    except Exception as e:
+        # An LLM outage mustn't fail the job; the diagnostics stand on their own
+        logger.warning("Explaining diagnostics failed: %s", e)
+        result["explanation"] = None
+        result["explanation_skipped"] = f"The explanation is unavailable: {e}"
+    return result
+
+
+async def submit_debug_job(code: str, user_id: str = "anonymous") -> Dict:
+    """
+    Queues (or reuses) `user_id`'s analysis job for `code` and returns its
+    record. The explanation is charged to `user_id`.
+    """
+    if len(code.encode("utf-8")) > MAX_CODE_BYTES:
+        raise ValueError(f"Code is larger than {MAX_CODE_BYTES // 1024} KB.")
+    return await job_queue.submit("debug", {"code": code, "user_id": user_id}, dedupe_key=analysis_key(code, user_id))
+
+
+job_queue.register("debug", run_debugger_job)
@@ -0,0 +1,171 @@
+# learn-rust-production-repo/api/_lib/error_index.py
+#
+# Compact index of rustc error codes: the compiler's own explanation (cut
+# down to a summary and a broken/fixed example pair) plus the lessons whose
+# pitfall triggers that code. /agent answers straight from it when a
+# question or pasted diagnostic mentions a known code, with no LLM call.
+#
+# Regenerate after a toolchain upgrade or a lesson change (from the repo root):
+#   python -m api._lib.error_index
+
+import json
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .corpus import load_lessons
+from .snapshot import SNAPSHOT_DIR
+from .snippets import PITFALL_EXPECTATIONS
+
+ERROR_INDEX_FILE = "error_index.json"
+# rustc error codes are E0001 up to (so far) the high 700s
+MAX_CODE_NUMBER = 999
+# Size caps per code, to keep the index small enough to ship
+PROSE_CHARS = 700
+EXAMPLE_CHARS = 500
+# Codes answered in one reply; more than this reads like a wall of text
+MAX_CODES_PER_ANSWER = 3
+
+_CODE_RE = re.compile(r"\bE0\d{3}\b", re.IGNORECASE)
+
+
+def _parse_explanation(text: str) -> Optional[Dict]:
+    """Splits `rustc --explain` markdown into prose paragraphs and code blocks."""
+    if "no longer emitted" in text:
+        return None
+    prose: List[str] = []
+    examples: List[str] = []
+    paragraph: List[str] = []
+    block: Optional[List[str]] = None
+    for line in text.splitlines():
+        if line.startswith("```"):
+            if block is None:
+                block = []
+            else:
+                # Lines starting with "# " are hidden setup lines in rustdoc examples
+                examples.append("\n".join(l for l in block if l != "#" and not l.startswith("# ")))
+                block = None
+            continue
+        if block is not None:
+            block.append(line)
+        elif line.strip():
+            paragraph.append(line.strip())
+        elif paragraph:
+            prose.append(" ".join(paragraph))
+            paragraph = []
+    if paragraph:
+        prose.append(" ".join(paragraph))
+    # Link definitions and "Erroneous code example:" captions add nothing on their own
+    prose = [p for p in prose if not re.match(r"^\[[^\]]+\]:", p) and not (p.endswith("example:") and len(p) < 40)]
+    # Reference-style links point at definitions that were just dropped
+    prose = [re.sub(r"\[([^\]]+)\]\[[^\]]*\]", r"\1", p) for p in prose]
+    # Lead-ins to code blocks, which are kept separately
+    prose = [re.sub(r"\s*(For example|Example):$", "", p) for p in prose]
+    if not prose:
+        return None
+    summary = prose[0]
+    details = " ".join(prose[1:])
+    if len(details) > PROSE_CHARS:
+        details = details[:PROSE_CHARS].rsplit(" ", 1)[0] + " …"
+    return {
+        "summary": summary,
+        "details": details,
+        "example": examples[0][:EXAMPLE_CHARS] if examples else "",
+        "fixed": examples[1][:EXAMPLE_CHARS] if len(examples) > 1 else "",
+    }
+
+
+def _explain(code: str) -> Optional[Dict]:
+    rustc = shutil.which("rustc")
+    result = subprocess.run([rustc, "--explain", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return _parse_explanation(result.stdout)
+
+
+def _lesson_notes() -> Dict[str, List[Dict]]:
+    """Lessons whose pitfall is verified to raise each code (see snippets.py)."""
+    lessons = {(lesson["source"], lesson["day_index"]): lesson for lesson in load_lessons()}
+    notes: Dict[str, List[Dict]] = {}
+    for key, expect in PITFALL_EXPECTATIONS.items():
+        if not _CODE_RE.fullmatch(expect) or key not in lessons:
+            continue
+        lesson = lessons[key]
+        pitfall = lesson.get("pitfall_example") or {}
+        notes.setdefault(expect, []).append({
+            "day_index": lesson["day_index"],
+            "title": lesson["title"],
+            "note": pitfall.get("errorHint") or pitfall.get("reason") or pitfall.get("explanation", ""),
+        })
+    return notes
+
+
+def build_error_index() -> Dict:
+    """Runs `rustc --explain` for every code and merges in the lesson pitfall notes."""
+    if shutil.which("rustc") is None:
+        raise RuntimeError("rustc is needed to build the error index.")
+    codes = [f"E{number:04d}" for number in range(1, MAX_CODE_NUMBER + 1)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        explanations = dict(zip(codes, pool.map(_explain, codes)))
+    toolchain = subprocess.run(["rustc", "--version"], capture_output=True, text=True).stdout.strip()
+    notes = _lesson_notes()
+    entries = {}
+    for code, explanation in explanations.items():
+        if explanation is None:
+            continue
+        entries[code] = {**explanation, "lessons": sorted(notes.get(code, []), key=lambda n: n["day_index"])}
+    return {"toolchain": toolchain, "codes": entries}
+
+
+@lru_cache(maxsize=1)
+def _read_index() -> Dict:
+    try:
+        return json.loads((SNAPSHOT_DIR / ERROR_INDEX_FILE).read_text(encoding="utf-8"))["codes"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def known_codes(*texts: Optional[str]) -> List[str]:
+    """
+    Indexed error codes mentioned in any of `texts`, in order of appearance,
+    in rustc's spelling ("e0382" is found as "E0382"). Non-strings are skipped.
+    """
+    index = _read_index()
+    found: List[str] = []
+    for text in texts:
+        if not isinstance(text, str):
+            continue
+        for code in map(str.upper, _CODE_RE.findall(text)):
+            if code in index and code not in found:
+                found.append(code)
+    return found
+
+
+def answer_for_codes(codes: List[str]) -> str:
+    """Markdown answer explaining each code, with the lessons that cover it."""
+    index = _read_index()
+    sections = []
+    for code in codes[:MAX_CODES_PER_ANSWER]:
+        entry = index[code]
+        lines = [f"**{code}**: {entry['summary']}"]
+        if entry["details"]:
+            lines.append(entry["details"])
+        if entry["example"]:
+            lines.append(f"This triggers it:\n```rust\n{entry['example']}\n```")
+        if entry["fixed"]:
+            lines.append(f"Fixed:\n```rust\n{entry['fixed']}\n```")
+        for lesson in entry["lessons"]:
+            lines.append(f"Covered on day {lesson['day_index']} ({lesson['title']}): {lesson['note']}")
+        lines.append(f"Full explanation: `rustc --explain {code}`")
+        sections.append("\n\n".join(lines))
+    return "\n\n---\n\n".join(sections)
+
+
+if __name__ == "__main__":
+    index = build_error_index()
+    (SNAPSHOT_DIR / ERROR_INDEX_FILE).write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    with_notes = sum(1 for entry in index["codes"].values() if entry["lessons"])
+    print(f"Wrote {len(index['codes'])} error codes ({with_notes} with lesson notes) to {SNAPSHOT_DIR / ERROR_INDEX_FILE}")
@@ -0,0 +1,456 @@
+# learn-rust-production-repo/api/_lib/executor.py
+
+import asyncio
+import itertools
+import os
+import resource
+import shutil
+import signal
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .build_cache import DependencyArtifacts, build_cache
+from .compile_cache import compile_cache, compile_cache_key, is_cacheable, toolchain_version
+from .scheduler import FairScheduler
+
+# Sandboxes kept warm per process
+EXEC_POOL_SIZE = int(os.environ.get("EXEC_POOL_SIZE", "4"))
+# Where sandboxes are created; /tmp is the writable place on Vercel
+EXEC_ROOT = Path(os.environ.get("EXEC_ROOT", Path(tempfile.gettempdir()) / "learnrust-exec"))
+# Warm the sandboxes at startup instead of on the first run
+EXEC_PREWARM = os.environ.get("EXEC_PREWARM", "") == "1"
+# Submissions (source and stdin) larger than this are rejected outright
+MAX_SOURCE_BYTES = 64 * 1024
+# How sandboxed processes are isolated: "bwrap" (bubblewrap: no network, own
+# PID namespace, a read-only system and only the sandbox directory writable)
+# or "none" (no isolation whatsoever; local development only). Without bwrap
+# installed, runs are refused rather than executed unisolated.
+EXEC_JAIL = os.environ.get("EXEC_JAIL", "bwrap")
+# Unprivileged user and group sandboxed processes run as when the server is root
+EXEC_UID = int(os.environ.get("EXEC_UID", "65534"))
+EXEC_GID = int(os.environ.get("EXEC_GID", "65534"))
+
+WARMUP_SOURCE = 'fn main() {\n    println!("ready");\n}\n'
+
+
+@dataclass(frozen=True)
+class RunLimits:
+    """Resource limits for one submission."""
+    cpu_seconds: int = 2
+    memory_mb: int = 256
+    wall_seconds: float = 5.0
+    output_bytes: int = 64 * 1024
+    compile_wall_seconds: float = 20.0
+    # rustc/LLVM reserve a lot of address space, so compiling gets a larger cap
+    compile_memory_mb: int = 2048
+    # Object files, incremental state and the linked binary
+    compile_file_mb: int = 256
+    # RLIMIT_NPROC: processes and threads of the sandbox user (caps fork bombs).
+    # rustc runs codegen on many threads, so compiling gets a larger cap.
+    processes: int = 64
+    compile_processes: int = 256
+
+
+DEFAULT_LIMITS = RunLimits()
+
+
+def _limit_process(cpu_seconds: int, memory_mb: int, file_bytes: int, processes: int):
+    """preexec_fn for sandboxed children: rlimits applied in the child before exec."""
+
+    def apply():
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024,) * 2)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_bytes, file_bytes))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_NPROC, (processes, processes))
+
+    return apply
+
+
+def sandbox_env(root: Path) -> Dict[str, str]:
+    """
+    The entire environment of a sandboxed process. Nothing is inherited from
+    the server, whose environment holds API keys that env!() would otherwise
+    compile straight into a learner's program.
+    """
+    return {
+        "PATH": "/usr/bin:/bin",
+        "HOME": str(root),
+        "TMPDIR": str(root),
+        "LANG": "C.UTF-8",
+        "RUST_BACKTRACE": "0",
+    }
+
+
+def own_sandbox_dir(path: Path) -> None:
+    """Hands a directory the sandboxed processes must write to over to the sandbox user."""
+    if os.geteuid() == 0:
+        os.chown(path, EXEC_UID, EXEC_GID)
+
+
+def jail_command(
+    command: Sequence[str], root: Path, env: Dict[str, str],
+    readable: Sequence[Path] = (), writable: Sequence[Path] = (),
+) -> List[str]:
+    """
+    Wraps `command` so it runs isolated: in bubblewrap with fresh network,
+    PID, IPC and UTS namespaces, a read-only view of the system plus
+    `readable`, an empty /tmp, and only `root` and `writable` writable.
+    A root server also drops to EXEC_UID inside the jail.
+
+    Raises RuntimeError when isolation is unavailable (fail closed).
+    """
+    if EXEC_JAIL == "none":
+        return list(command)
+    if EXEC_JAIL != "bwrap":
+        raise RuntimeError(f"Unknown EXEC_JAIL: {EXEC_JAIL!r}")
+    bwrap = shutil.which("bwrap")
+    if bwrap is None:
+        raise RuntimeError("Sandbox isolation is unavailable: bubblewrap (bwrap) is not installed on this host.")
+    jail = [bwrap, "--die-with-parent", "--new-session", "--unshare-all", "--clearenv", "--ro-bind", "/usr", "/usr"]
+    for path in ("/bin", "/sbin", "/lib", "/lib64", "/etc/alternatives", "/etc/ld.so.cache"):
+        jail += ["--ro-bind-try", path, path]
+    jail += ["--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp"]
+    for path in readable:
+        jail += ["--ro-bind", str(path), str(path)]
+    for path in (root, *writable):
+        jail += ["--bind", str(path), str(path)]
+    for name, value in env.items():
+        jail += ["--setenv", name, value]
+    jail += ["--chdir", str(root), "--"]
+    if os.geteuid() == 0:
+        setpriv = shutil.which("setpriv")
+        if setpriv is None:
+            raise RuntimeError("Sandbox isolation is unavailable: setpriv is needed to drop root inside the jail.")
+        jail += [
+            setpriv, f"--reuid={EXEC_UID}", f"--regid={EXEC_GID}", "--clear-groups", "--no-new-privs", "--inh-caps=-all",
+        ]
+    return jail + list(command)
+
+
+_toolchain: Optional[Tuple[str, Path]] = None
+
+
+async def rustc_toolchain() -> Tuple[str, Path]:
+    """
+    (rustc binary, sysroot) of the host toolchain, resolved once. rustup's
+    `rustc` proxy needs the server's HOME, which sandboxed processes don't
+    get, so the toolchain's own binary is called directly.
+    """
+    global _toolchain
+    if _toolchain is None:
+        rustc = shutil.which("rustc")
+        if rustc is None:
+            raise RuntimeError("rustc is not installed on this host.")
+        process = await asyncio.create_subprocess_exec(
+            rustc, "--print", "sysroot", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        sysroot = Path(stdout.decode().strip())
+        binary = sysroot / "bin" / "rustc"
+        _toolchain = (str(binary) if process.returncode == 0 and binary.exists() else rustc, sysroot)
+    return _toolchain
+
+
+async def _read_capped(
+    stream: asyncio.StreamReader, cap: int, halt: asyncio.Event, watch: Optional[Callable[[bytes], bool]] = None,
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Reads up to `cap` bytes. Sets `halt` (so the process gets killed) once the
+    cap overflows, or once `watch` returns False for a chunk; the second value
+    says which ("overflow" / "stopped").
+    """
+    data = bytearray()
+    while True:
+        chunk = await stream.read(8192)
+        if not chunk:
+            return bytes(data), None
+        room = cap - len(data)
+        data += chunk[:room]
+        if watch is not None and not watch(chunk[:room]):
+            halt.set()
+            return bytes(data), "stopped"
+        if len(chunk) > room:
+            halt.set()
+            return bytes(data), "overflow"
+
+
+async def run_limited(
+    command, cwd: Path, *, stdin: bytes = b"", wall_seconds: float, cpu_seconds: int,
+    memory_mb: int, output_bytes: int, env: Dict[str, str], processes: int, file_bytes: Optional[int] = None,
+    watch_stdout: Optional[Callable[[bytes], bool]] = None,
+) -> Dict:
+    """
+    Runs `command` in its own process group under rlimits and a wall-clock
+    timeout, capturing at most `output_bytes` of stdout and of stderr.
+    Output beyond the cap kills the process (a runaway println! loop), as
+    does `watch_stdout` returning False for a chunk of stdout.
+    Files the process writes are capped at `file_bytes` (default 16x output).
+    `env` is the whole environment; nothing is inherited from the server.
+    """
+    started = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        preexec_fn=_limit_process(cpu_seconds, memory_mb, file_bytes or output_bytes * 16, processes),
+    )
+    halt = asyncio.Event()
+
+    async def feed():
+        try:
+            process.stdin.write(stdin)
+            await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    readers = asyncio.gather(
+        _read_capped(process.stdout, output_bytes, halt, watch_stdout),
+        _read_capped(process.stderr, output_bytes, halt),
+        feed(),
+    )
+    halt_wait = asyncio.ensure_future(halt.wait())
+    timed_out = False
+    try:
+        done, _ = await asyncio.wait({readers, halt_wait}, timeout=wall_seconds, return_when=asyncio.FIRST_COMPLETED)
+        timed_out = not done
+        if timed_out or halt.is_set():
+            _kill_group(process)
+        (stdout, stdout_end), (stderr, stderr_end), _ = await readers
+        # A program can close stdout and stderr and keep running, so the
+        # wall clock covers the wait for it to exit as well
+        try:
+            await asyncio.wait_for(process.wait(), max(0.0, started + wall_seconds - time.monotonic()))
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill_group(process)
+            await process.wait()
+    finally:
+        halt_wait.cancel()
+        if process.returncode is None:
+            _kill_group(process)
+            await process.wait()
+    return {
+        "exit_code": process.returncode,
+        "stdout": stdout.decode("utf-8", "replace"),
+        "stderr": stderr.decode("utf-8", "replace"),
+        "truncated": "overflow" in (stdout_end, stderr_end),
+        "stopped": stdout_end == "stopped",
+        "timed_out": timed_out,
+        # Killed by RLIMIT_CPU (SIGXCPU/SIGKILL) rather than by us
+        "cpu_limited": _killed_by(process.returncode) in (signal.SIGXCPU, signal.SIGKILL) and not (timed_out or halt.is_set()),
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+
+
+def _killed_by(returncode: Optional[int]) -> Optional[int]:
+    """The signal that ended a process: -N from Python, or 128+N as bwrap reports its child's."""
+    if returncode is None:
+        return None
+    if returncode < 0:
+        return -returncode
+    return returncode - 128 if EXEC_JAIL == "bwrap" and returncode > 128 else None
+
+
+def _kill_group(process) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class Sandbox:
+    """
+    One warm working directory. Submissions are compiled with rustc directly
+    (no cargo resolution or fingerprinting per run) against the shared
+    dependency artifacts of their crate set.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.source = root / "src" / "main.rs"
+        self.binary = root / "submission"
+
+    async def warm(self) -> None:
+        (self.root / "src").mkdir(parents=True, exist_ok=True)
+        own_sandbox_dir(self.root)
+        self.source.write_text(WARMUP_SOURCE, encoding="utf-8")
+        result = await self.compile(DEFAULT_LIMITS, DependencyArtifacts("std"))
+        if not result["success"]:
+            raise RuntimeError(f"Sandbox warm-up failed: {result['diagnostics']}")
+
+    async def compile(self, limits: RunLimits, artifacts: DependencyArtifacts, session: Optional[Path] = None) -> Dict:
+        rustc, sysroot = await rustc_toolchain()
+        command = [
+            rustc, "--edition", "2021", "--crate-type", "bin", "--crate-name", "submission",
+            "--color", "never", "-C", "debuginfo=0", *artifacts.rustc_args(),
+        ]
+        readable = [sysroot] + ([Path(artifacts.deps_dir)] if artifacts.deps_dir else [])
+        writable = []
+        if session is not None:
+            command += ["-C", f"incremental={session}"]
+            own_sandbox_dir(session)
+            writable.append(session)
+        env = sandbox_env(self.root)
+        result = await run_limited(
+            jail_command([*command, "src/main.rs", "-o", str(self.binary)], self.root, env, readable, writable),
+            self.root,
+            env=env,
+            wall_seconds=limits.compile_wall_seconds,
+            cpu_seconds=int(limits.compile_wall_seconds),
+            memory_mb=limits.compile_memory_mb,
+            output_bytes=limits.output_bytes,
+            file_bytes=limits.compile_file_mb * 1024 * 1024,
+            processes=limits.compile_processes,
+        )
+        return {
+            "success": result["exit_code"] == 0 and not result["timed_out"],
+            "diagnostics": result["stderr"],
+            "timed_out": result["timed_out"],
+            "duration_ms": result["duration_ms"],
+        }
+
+    async def run(
+        self, stdin: bytes, limits: RunLimits, args: Sequence[str] = (),
+        watch_stdout: Optional[Callable[[bytes], bool]] = None,
+    ) -> Dict:
+        env = sandbox_env(self.root)
+        return await run_limited(
+            jail_command([str(self.binary), *args], self.root, env),
+            self.root,
+            stdin=stdin,
+            watch_stdout=watch_stdout,
+            wall_seconds=limits.wall_seconds,
+            cpu_seconds=limits.cpu_seconds,
+            memory_mb=limits.memory_mb,
+            output_bytes=limits.output_bytes,
+            env=env,
+            processes=limits.processes,
+        )
+
+
+# Tells apart several pools in one process
+_pool_ids = itertools.count()
+
+
+class ExecutionPool:
+    """
+    Compiles and runs learner submissions on a fixed pool of warm sandboxes.
+    Submissions queue in a fair-share scheduler with one slot per sandbox,
+    so at most `size` compiles run at once and no user can take them all.
+    """
+
+    def __init__(self, size: int = EXEC_POOL_SIZE, root: Path = EXEC_ROOT):
+        self.size = size
+        self.root = root
+        self.scheduler = FairScheduler(capacity=size)
+        self._free: Optional[asyncio.Queue] = None
+        self._starting: Optional[asyncio.Task] = None
+        self._sandboxes: List[Sandbox] = []
+        self.runs = 0
+        self.compile_failures = 0
+        self.timeouts = 0
+
+    async def start(self) -> None:
+        """Creates and warms every sandbox. Safe to call repeatedly."""
+        if self._starting is None or (self._starting.done() and self._starting.exception()):
+            # First call, or the previous warm-up failed (e.g. cargo was missing)
+            self._starting = asyncio.get_running_loop().create_task(self._warm_all())
+        await asyncio.shield(self._starting)
+
+    async def _warm_all(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        # EXEC_ROOT is shared by every worker (and pool), so names are unique per pool
+        prefix = f"sandbox-{os.getpid()}-{next(_pool_ids)}"
+        sandboxes = [Sandbox(self.root / f"{prefix}-{i}") for i in range(self.size)]
+        self._sandboxes = sandboxes
+        await asyncio.gather(*(sandbox.warm() for sandbox in sandboxes))
+        self._free = asyncio.Queue()
+        for sandbox in sandboxes:
+            self._free.put_nowait(sandbox)
+
+    async def execute(
+        self, code: str, stdin: str = "", limits: RunLimits = DEFAULT_LIMITS,
+        user_id: str = "anonymous", crate_set: str = "std", group: str = "run",
+    ) -> Dict:
+        """
+        Compiles `code` against `crate_set` in the user's incremental session
+        and, if it builds, runs it once with `stdin`. A newer submission from
+        the same user and `group` replaces this one while it is still queued
+        (RunSuperseded).
+        """
+        if len(code.encode("utf-8")) > MAX_SOURCE_BYTES or len(stdin.encode("utf-8")) > MAX_SOURCE_BYTES:
+            raise ValueError(f"Code and stdin must each be smaller than {MAX_SOURCE_BYTES // 1024} KB.")
+        key = compile_cache_key(code, stdin, await toolchain_version(), asdict(limits), crate_set)
+        cached = await compile_cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        async with self.compiled(code, limits, user_id, crate_set, group) as (ticket, sandbox, compiled):
+            run = await sandbox.run(stdin.encode("utf-8"), limits) if compiled["success"] else None
+        if run and run["timed_out"]:
+            self.timeouts += 1
+        result = {"compile": compiled, "run": run, "limits": asdict(limits), "crate_set": compiled["crate_set"]}
+        # A run that fell back to std isn't the answer for its crate set
+        if is_cacheable(result) and compiled["crate_set"] == crate_set:
+            await compile_cache.set(key, result)
+        return {**result, "cached": False, "queue_wait_ms": round(ticket.wait_seconds * 1000, 1)}
+
+    @asynccontextmanager
+    async def compiled(
+        self, code: str, limits: RunLimits, user_id: str, crate_set: str, group: str,
+    ) -> AsyncIterator[Tuple[object, Sandbox, Dict]]:
+        """
+        Waits for a scheduler slot, compiles `code` into a sandbox and holds
+        both for the body of the `async with`, so the binary can be run as
+        many times as needed. Yields (ticket, sandbox, compile result). While
+        `crate_set` is still being built the code compiles against std; the
+        compile result's `crate_set` says which was used.
+        """
+        artifacts = await build_cache.artifacts(crate_set)
+        await self.start()
+        ticket = await self.scheduler.acquire(user_id, group)
+        sandbox = self._free.get_nowait()
+        try:
+            sandbox.source.write_text(code, encoding="utf-8")
+            compiled = await sandbox.compile(limits, artifacts, build_cache.session_dir(user_id, artifacts.crate_set))
+            compiled["crate_set"] = artifacts.crate_set
+            self.runs += 1
+            if not compiled["success"]:
+                self.compile_failures += 1
+            yield ticket, sandbox, compiled
+        finally:
+            self._free.put_nowait(sandbox)
+            self.scheduler.release(ticket)
+
+    async def close(self) -> None:
+        """Removes this pool's own sandboxes; other workers' under the same root stay warm."""
+        if self._starting is not None and self._starting.done():
+            for sandbox in self._sandboxes:
+                shutil.rmtree(sandbox.root, ignore_errors=True)
+        self._sandboxes = []
+        self._starting = None
+        self._free = None
+
+    def stats(self) -> Dict:
+        return {
+            "size": self.size,
+            "warm": self._free is not None,
+            "free": self._free.qsize() if self._free else 0,
+            "runs": self.runs,
+            "compile_failures": self.compile_failures,
+            "timeouts": self.timeouts,
+            "scheduler": self.scheduler.stats(),
+        }
+
+
+execution_pool = ExecutionPool()
@@ -0,0 +1,228 @@
+# learn-rust-production-repo/api/_lib/grading.py
+
+import asyncio
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .corpus import lessons_for_day
+from .executor import DEFAULT_LIMITS, MAX_SOURCE_BYTES, RunLimits, execution_pool
+
+# Test cases run at the same time against one compiled binary
+GRADE_CASE_CONCURRENCY = int(os.environ.get("EXEC_GRADE_CONCURRENCY", "4"))
+# Output allowed beyond the expected length (trailing whitespace, blank lines)
+OUTPUT_SLACK_BYTES = 1024
+# Characters of actual output echoed back per case
+OUTPUT_PREVIEW_CHARS = 2000
+# How a case's expected_stdout is compared with the output, line by line:
+# exact text, one regular expression per line, or the same lines in any order
+MATCH_MODES = ("exact", "regex", "unordered")
+
+
+def challenge_test_cases(challenge: Dict) -> List[Dict]:
+    """
+    Test cases declared by a challenge: an explicit `test_cases` list of
+    {stdin, args, expected_stdout, match}, or else the single exact
+    `expectedOutput` of the template challenges (days 6-12).
+
+    Only those are graded. The free-form challenges (days 1-5 and 13-30)
+    have none: their snake_case `expected_output` describes the result in
+    prose ("Correctly returns the longer slice."), it isn't program output.
+    """
+    if challenge.get("test_cases"):
+        cases = []
+        for i, case in enumerate(challenge["test_cases"]):
+            match = case.get("match", "exact")
+            if match not in MATCH_MODES:
+                raise ValueError(f"Unknown match mode '{match}' in test case {i + 1}.")
+            cases.append({
+                "name": case.get("name") or f"case {i + 1}",
+                "stdin": case.get("stdin", ""),
+                "args": list(case.get("args", [])),
+                "expected_stdout": case["expected_stdout"],
+                "match": match,
+            })
+        return cases
+    if "expectedOutput" in challenge:
+        return [{"name": "case 1", "stdin": "", "args": [], "expected_stdout": challenge["expectedOutput"], "match": "exact"}]
+    return []
+
+
+def test_cases_for_day(day_index: Optional[int]) -> List[Dict]:
+    for lesson in lessons_for_day(day_index):
+        cases = challenge_test_cases(lesson.get("challenge") or {})
+        if cases:
+            return cases
+    return []
+
+
+def _normalize_lines(text: str) -> List[str]:
+    lines = [line.rstrip() for line in text.replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class OutputMatcher:
+    """
+    Compares stdout with the expected output line by line as it streams in,
+    ignoring trailing whitespace and trailing blank lines (like the editor's
+    trim()). feed() returns False at the first divergent line or once the
+    output is longer than the expected output could be, so the process can
+    be killed without reading the rest.
+
+    In "regex" mode each expected line is a pattern the output line must
+    match in full; in "unordered" mode the non-blank lines may come in any
+    order, and a line fails as soon as no expected line is left for it.
+    """
+
+    def __init__(self, expected: str, cap: int, mode: str = "exact"):
+        self.mode = mode
+        self.expected = _normalize_lines(expected)
+        if mode == "regex":
+            self._patterns = [re.compile(line) for line in self.expected]
+            # A pattern says little about how long the matching output is
+            self.cap = cap
+        else:
+            self.cap = min(cap, len(expected.encode("utf-8")) + OUTPUT_SLACK_BYTES)
+        if mode == "unordered":
+            self._remaining = Counter(line for line in self.expected if line)
+            self.expected = [line for line in self.expected if line]
+        self.matched = 0
+        self.extra_blank = 0
+        self.seen = 0
+        self.failure: Optional[str] = None
+        self._partial = bytearray()
+
+    def feed(self, chunk: bytes) -> bool:
+        self.seen += len(chunk)
+        if self.seen > self.cap:
+            self.failure = f"Output is longer than expected (stopped reading after {self.cap} bytes)."
+            return False
+        self._partial += chunk
+        while b"\n" in self._partial:
+            line, _, rest = bytes(self._partial).partition(b"\n")
+            self._partial = bytearray(rest)
+            if not self._check(line.decode("utf-8", "replace").rstrip()):
+                return False
+        return True
+
+    def _check(self, line: str) -> bool:
+        if self.mode == "unordered":
+            return self._check_unordered(line)
+        if self.matched < len(self.expected) and not self.extra_blank:
+            if self._line_matches(line):
+                self.matched += 1
+                return True
+            self.failure = f"Line {self.matched + 1}: expected {self.expected[self.matched]!r}, got {line!r}."
+            return False
+        if not line:
+            # Blank lines are fine only if nothing but blank lines follows
+            self.extra_blank += 1
+            return True
+        self.failure = f"Unexpected extra output: {line!r}."
+        return False
+
+    def _line_matches(self, line: str) -> bool:
+        if self.mode == "regex":
+            return self._patterns[self.matched].fullmatch(line) is not None
+        return line == self.expected[self.matched]
+
+    def _check_unordered(self, line: str) -> bool:
+        if not line:
+            return True
+        if self._remaining[line] > 0:
+            self._remaining[line] -= 1
+            self.matched += 1
+            return True
+        self.failure = f"Unexpected line {line!r} (not expected, or printed too often)."
+        return False
+
+    def finish(self) -> bool:
+        """Checks the final unterminated line and that no expected line is missing."""
+        if self.failure:
+            return False
+        if self._partial and not self._check(self._partial.decode("utf-8", "replace").rstrip()):
+            return False
+        if self.matched < len(self.expected):
+            self.failure = f"Output ended after {self.matched} of {len(self.expected)} expected lines."
+            return False
+        return True
+
+
+class _CaseFailed(Exception):
+    """Raised by a failing case under fail_fast to stop the others."""
+
+
+def _verdict(run: Dict, matcher: OutputMatcher, limits: RunLimits) -> Optional[str]:
+    """None when the case passed, otherwise the reason it failed."""
+    if run["stopped"]:
+        return matcher.failure
+    if run["timed_out"]:
+        return f"Timed out after {limits.wall_seconds:g}s."
+    if run["cpu_limited"]:
+        return f"Used more than {limits.cpu_seconds}s of CPU time."
+    if run["truncated"]:
+        return f"Output exceeded {limits.output_bytes} bytes."
+    if run["exit_code"] != 0:
+        return f"Exited with code {run['exit_code']}."
+    return None if matcher.finish() else matcher.failure
+
+
+async def grade_submission(
+    code: str, cases: List[Dict], user_id: str = "anonymous", crate_set: str = "std",
+    fail_fast: bool = False, limits: RunLimits = DEFAULT_LIMITS,
+) -> Dict:
+    """
+    Compiles `code` once, then runs every case against the binary, a few at
+    a time, each under its own timeout. With `fail_fast`, the first failing
+    case cancels the rest (they are reported as skipped).
+    """
+    if len(code.encode("utf-8")) > MAX_SOURCE_BYTES:
+        raise ValueError(f"Code must be smaller than {MAX_SOURCE_BYTES // 1024} KB.")
+
+    async with execution_pool.compiled(code, limits, user_id, crate_set, "grade") as (ticket, sandbox, compiled):
+        results: List[Dict] = [
+            {"name": case["name"], "passed": False, "skipped": True} for case in cases
+        ]
+        if compiled["success"]:
+            semaphore = asyncio.Semaphore(GRADE_CASE_CONCURRENCY)
+
+            async def run_case(index: int, case: Dict) -> None:
+                async with semaphore:
+                    matcher = OutputMatcher(case["expected_stdout"], limits.output_bytes, case.get("match", "exact"))
+                    run = await sandbox.run(
+                        case["stdin"].encode("utf-8"), limits, args=case["args"], watch_stdout=matcher.feed,
+                    )
+                reason = _verdict(run, matcher, limits)
+                results[index] = {
+                    "name": case["name"],
+                    "passed": reason is None,
+                    "skipped": False,
+                    "reason": reason,
+                    "stdout": run["stdout"][:OUTPUT_PREVIEW_CHARS],
+                    "stderr": run["stderr"][-OUTPUT_PREVIEW_CHARS:],
+                    "exit_code": run["exit_code"],
+                    "duration_ms": run["duration_ms"],
+                }
+                if reason is not None and fail_fast:
+                    raise _CaseFailed()
+
+            tasks = [asyncio.ensure_future(run_case(i, case)) for i, case in enumerate(cases)]
+            try:
+                await asyncio.gather(*tasks)
+            except _CaseFailed:
+                pass
+            finally:
+                # Cancelled runs kill their process group on the way out
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "passed": compiled["success"] and all(result["passed"] for result in results),
+        "compile": compiled,
+        "cases": results,
+        "queue_wait_ms": round(ticket.wait_seconds * 1000, 1),
+    }
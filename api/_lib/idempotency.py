@@ -0,0 +1,128 @@
+# learn-rust-production-repo/api/_lib/idempotency.py
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .cache import TTLCache
+
+# How long a completed response is replayed for a repeated key
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get("AGENT_IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Completed responses kept; the least recently used are dropped first
+IDEMPOTENCY_STORE_SIZE = int(os.environ.get("AGENT_IDEMPOTENCY_STORE_SIZE", "4096"))
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The same Idempotency-Key was reused with a different request body."""
+
+
+def idempotency_key(headers) -> Optional[str]:
+    """The request's Idempotency-Key, or None. Raises ValueError if it is unusable."""
+    key = headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters.")
+    return key
+
+
+def request_fingerprint(body: Any) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Pending:
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.waiters = 0
+
+
+class IdempotencyStore:
+    """
+    Runs each (scope, key) at most once. A duplicate that arrives while the
+    first request is still running waits on the same task; one that arrives
+    later gets the stored response from a bounded TTL cache. Only successful
+    results are stored, so a retry after an error runs again.
+
+    Like SingleFlight, the shared task is cancelled only when every waiter
+    has gone away.
+    """
+
+    def __init__(self, maxsize: int = IDEMPOTENCY_STORE_SIZE, ttl: float = IDEMPOTENCY_TTL_SECONDS):
+        self._done = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending: Dict[Hashable, _Pending] = {}
+        self.computed = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    async def run(self, key: Hashable, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, replayed); replayed is True when this call started no work of its own."""
+        stored = self._done.get(key)
+        if stored is not None:
+            self._check(stored[0], fingerprint)
+            self.replayed += 1
+            return stored[1], True
+
+        pending = self._pending.get(key)
+        attached = pending is not None
+        if attached:
+            self._check(pending.fingerprint, fingerprint)
+            self.attached += 1
+        else:
+            pending = self._start(key, fingerprint, compute)
+        pending.waiters += 1
+        try:
+            return await asyncio.shield(pending.task), attached
+        finally:
+            pending.waiters -= 1
+            if pending.waiters == 0 and not pending.task.done():
+                # Forget it before cancelling, so a retry arriving before the
+                # task unwinds runs afresh instead of awaiting a cancelled task
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+                pending.task.cancel()
+
+    def _check(self, stored_fingerprint: str, fingerprint: str) -> None:
+        if stored_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict("This Idempotency-Key was already used with a different request.")
+
+    def _start(self, key: Hashable, fingerprint: str, compute: Callable[[], Awaitable[Any]]) -> _Pending:
+        self.computed += 1
+
+        async def run():
+            try:
+                result = await compute()
+                self._done.set(key, (fingerprint, result))
+                return result
+            finally:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+
+        task = asyncio.get_running_loop().create_task(run())
+        # Errors reach whoever is still waiting; don't warn when nobody was
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        pending = _Pending(fingerprint, task)
+        self._pending[key] = pending
+        return pending
+
+    def stats(self) -> Dict:
+        return {
+            "stored": len(self._done),
+            "in_flight": len(self._pending),
+            "computed": self.computed,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "ttl_seconds": self._done.ttl,
+        }
+
+
+# Keyed by (route, user id, Idempotency-Key)
+idempotency_store = IdempotencyStore()
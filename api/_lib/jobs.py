@@ -0,0 +1,225 @@
+# learn-rust-production-repo/api/_lib/jobs.py
+
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+# Job records live in a small SQLite file; /tmp is the writable place on Vercel
+JOB_DB_PATH = os.environ.get("AGENT_JOB_DB", str(Path(tempfile.gettempdir()) / "learnrust-jobs.db"))
+# Finished (and abandoned) jobs are deleted after this long
+JOB_TTL_SECONDS = float(os.environ.get("AGENT_JOB_TTL_SECONDS", "3600"))
+# Background workers per process
+JOB_WORKERS = int(os.environ.get("AGENT_JOB_WORKERS", "2"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobStore:
+    """
+    Job records in SQLite, so polling works from any worker on the host.
+    Calls block on disk I/O; async code runs them in a worker thread
+    (one connection per thread), as JobQueue does.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, ttl: float = JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, dedupe_key TEXT, status TEXT NOT NULL,"
+            " payload TEXT NOT NULL, result TEXT, error TEXT,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (kind, dedupe_key)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, kind: str, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, dedupe_key, status, payload, created_at, updated_at, expires_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, dedupe_key, QUEUED, json.dumps(payload), now, now, now + self.ttl),
+        )
+        return self.get(job_id)
+
+    def find(self, kind: str, dedupe_key: str) -> Optional[Dict]:
+        """Latest unexpired, not-failed job with this dedupe key."""
+        row = self._connect().execute(
+            "SELECT id FROM jobs WHERE kind = ? AND dedupe_key = ? AND status != ? AND expires_at > ?"
+            " ORDER BY created_at DESC LIMIT 1",
+            (kind, dedupe_key, FAILED, time.time()),
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def update(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        now = time.time()
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, now, now + self.ttl, job_id),
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT id, kind, status, payload, result, error, created_at, updated_at FROM jobs"
+            " WHERE id = ? AND expires_at > ?",
+            (job_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "payload": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+    def cleanup(self) -> int:
+        """Deletes expired jobs; returns how many were removed."""
+        return self._connect().execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a pool of background asyncio workers.
+
+    Handlers are registered per job kind and must be async; CPU- or
+    process-heavy work inside them should go through subprocesses so the
+    event loop stays free. Note that serverless platforms may freeze the
+    process after the response, so long-lived deployments are preferred
+    for heavy job traffic.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS):
+        self._store = store
+        self.workers = workers
+        self._handlers: Dict[str, Callable[[Dict], Awaitable[Dict]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        # job id -> event set on the next status change, and how many
+        # same-process listeners wait on it (the entry goes when they leave)
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._listeners: Dict[str, int] = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore()
+        return self._store
+
+    def register(self, kind: str, handler: Callable[[Dict], Awaitable[Dict]]) -> None:
+        self._handlers[kind] = handler
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, kind: str, payload: Dict, dedupe_key: Optional[str] = None) -> Dict:
+        """Queues a job and returns its record immediately. Identical live jobs are reused."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        await asyncio.to_thread(self.store.cleanup)
+        if dedupe_key is not None:
+            existing = await asyncio.to_thread(self.store.find, kind, dedupe_key)
+            if existing is not None:
+                self.deduplicated += 1
+                return existing
+        job = await asyncio.to_thread(self.store.create, kind, payload, dedupe_key)
+        self.submitted += 1
+        self._ensure_workers()
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """The job's record, read off the event loop."""
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _set_status(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        await asyncio.to_thread(self.store.update, job_id, status, result, error)
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            job = await self.get(job_id)
+            if job is None:
+                continue
+            await self._set_status(job_id, RUNNING)
+            try:
+                result = await self._handlers[job["kind"]](job["payload"])
+                await self._set_status(job_id, SUCCEEDED, result=result)
+                self.completed += 1
+            except asyncio.CancelledError:
+                # Shielded so the record is written even though we're cancelled
+                await asyncio.shield(self._set_status(job_id, FAILED, error="Worker shut down"))
+                raise
+            except Exception as e:
+                await self._set_status(job_id, FAILED, error=str(e))
+                self.failed += 1
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """Waits until the job's status changes here, or `timeout` passes (other workers)."""
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        self._listeners[job_id] = self._listeners.get(job_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._listeners[job_id] -= 1
+            if not self._listeners[job_id]:
+                del self._listeners[job_id]
+                if self._changed.get(job_id) is event:
+                    del self._changed[job_id]
+
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+def public_job(job: Dict) -> Dict:
+    """A job record as returned by the API (without the submitted payload)."""
+    return {key: value for key, value in job.items() if key != "payload"}
+
+
+job_queue = JobQueue()
@@ -0,0 +1,33 @@
+# learn-rust-production-repo/api/_lib/lazy.py
+
+import importlib
+from types import ModuleType
+
+
+class LazyModule(ModuleType):
+    """Module proxy that performs the real import on first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Defers importing `name` until it is first used.
+
+    Cold starts on Vercel pay for every import in api/index.py, so heavy
+    dependencies (numpy, provider SDKs) are only loaded by the requests
+    that need them. /api/status never touches them.
+    """
+    return LazyModule(name)
@@ -0,0 +1,146 @@
+# learn-rust-production-repo/api/_lib/llm.py
+
+import os
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+
+from .llm_router import LLMRouter
+
+# Same default model as lessons/groq_llm.py
+DEFAULT_MODEL = os.environ.get("AGENT_MODEL", "llama3-70b-8192")
+GEMINI_MODEL = os.environ.get("AGENT_GEMINI_MODEL", "gemini-2.0-flash")
+# Backends the router may pick from, as comma-separated provider:model pairs.
+# Unconfigured providers (no API key) are skipped.
+LLM_BACKENDS = [
+    tuple(entry.strip().split(":", 1))
+    for entry in os.environ.get(
+        "AGENT_LLM_BACKENDS", f"groq:{DEFAULT_MODEL},groq:mixtral-8x7b-32768,gemini:{GEMINI_MODEL}"
+    ).split(",")
+    if ":" in entry
+]
+
+_gemini_client = None
+
+
+@dataclass
+class LLMChunk:
+    """
+    One piece of a streamed completion. `usage` is only set on the final
+    chunk; `model` is the model the router picked.
+    """
+    text: str
+    usage: Optional[Dict] = None
+    model: Optional[str] = None
+
+
+def _groq_configured() -> bool:
+    return bool(os.environ.get("GROQ_API_KEY"))
+
+
+def _gemini_api_key() -> Optional[str]:
+    return os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+
+
+def is_configured() -> bool:
+    """True when some provider has an API key, i.e. the agent can call a real model."""
+    return bool(router.configured())
+
+
+def _get_groq_client():
+    # One pooled client per process, shared with the lesson scripts
+    # (lessons/groq_llm.py), which also make it per event loop on first use.
+    from lessons.groq_llm import get_client
+
+    return get_client()
+
+
+async def close_clients() -> None:
+    """Closes the pooled LLM clients' connections (call on shutdown)."""
+    from lessons.groq_llm import close_client
+
+    await close_client()
+
+
+def _get_gemini_client():
+    global _gemini_client
+    if _gemini_client is None:
+        from google import genai
+        _gemini_client = genai.Client(api_key=_gemini_api_key())
+    return _gemini_client
+
+
+def _usage_dict(usage) -> Dict:
+    """Converts a Groq usage object to a plain dict of token counts."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        # Prompt tokens the provider served from its prefix cache
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+    }
+
+
+async def _stream_groq(messages: List[Dict], model_name: str) -> AsyncIterator[LLMChunk]:
+    stream = await _get_groq_client().chat.completions.create(
+        messages=messages,
+        model=model_name,
+        temperature=0.7,
+        stream=True,
+    )
+    async for chunk in stream:
+        text = chunk.choices[0].delta.content if chunk.choices else None
+        # Groq reports token usage on the last chunk under x_groq
+        usage = chunk.x_groq.usage if chunk.x_groq and chunk.x_groq.usage else None
+        yield LLMChunk(text=text or "", usage=_usage_dict(usage) if usage else None)
+
+
+async def _stream_gemini(messages: List[Dict], model_name: str) -> AsyncIterator[LLMChunk]:
+    from google.genai import types
+
+    # OpenAI-format messages: system text becomes the system instruction,
+    # and the assistant role is called "model"
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    contents = [
+        types.Content(role="model" if m["role"] == "assistant" else "user", parts=[types.Part(text=m["content"])])
+        for m in messages if m["role"] != "system"
+    ]
+    stream = await _get_gemini_client().aio.models.generate_content_stream(
+        model=model_name,
+        contents=contents,
+        config=types.GenerateContentConfig(system_instruction=system or None, temperature=0.7),
+    )
+    usage = None
+    async for chunk in stream:
+        # Every chunk carries the running totals; only the last one is reported
+        usage = chunk.usage_metadata or usage
+        if chunk.text:
+            yield LLMChunk(text=chunk.text)
+    if usage is not None:
+        prompt_tokens = usage.prompt_token_count or 0
+        completion_tokens = usage.candidates_token_count or 0
+        yield LLMChunk(text="", usage={
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": usage.total_token_count or prompt_tokens + completion_tokens,
+            "cached_tokens": usage.cached_content_token_count or 0,
+        })
+
+
+router = LLMRouter(LLM_BACKENDS, {
+    "groq": (_groq_configured, _stream_groq),
+    "gemini": (lambda: bool(_gemini_api_key()), _stream_gemini),
+})
+
+
+async def stream_chat(messages: List[Dict], hedge: bool = False) -> AsyncIterator[LLMChunk]:
+    """
+    Streams a chat completion from the fastest healthy backend (see
+    api/_lib/llm_router.py), yielding text deltas as they arrive.
+
+    :param messages: Chat messages in OpenAI format.
+    :param hedge: Race a second backend if the first is slow to start; for interactive requests.
+    """
+    async for (_, model), chunk in router.stream(messages, hedge=hedge):
+        chunk.model = model
+        yield chunk
@@ -0,0 +1,253 @@
+# learn-rust-production-repo/api/_lib/llm_router.py
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# Weight of the newest sample in the latency and error averages
+EWMA_ALPHA = float(os.environ.get("LLM_EWMA_ALPHA", "0.2"))
+# Time-to-first-token samples kept per backend for the hedging percentile
+LATENCY_SAMPLES = 200
+# Samples needed before the p95 is trusted; until then HEDGE_DEFAULT_DELAY is used
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "2.0"))
+HEDGE_MIN_DELAY_SECONDS = 0.1
+# Hedge interactive requests at all ("0" turns it off)
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "1") != "0"
+# Consecutive failures that open a backend's circuit, and how long it stays open
+BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every backend is unconfigured or has its circuit open."""
+
+
+class BackendHealth:
+    """
+    Rolling view of one provider/model: EWMA of time to first chunk and of
+    the error rate, recent latencies for the p95, and a circuit breaker.
+
+    The breaker opens after BREAKER_FAILURES failures in a row. Once the
+    cooldown has passed a single probe request is let through (half-open);
+    its outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self):
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == OPEN and now - self.opened_at >= BREAKER_COOLDOWN_SECONDS:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return not self.probing
+        return self.state == CLOSED
+
+    def started(self) -> None:
+        self.requests += 1
+        if self.state == HALF_OPEN:
+            self.probing = True
+
+    def succeeded(self, first_chunk_seconds: float) -> None:
+        self._latencies.append(first_chunk_seconds)
+        self.latency_ewma = first_chunk_seconds if self.latency_ewma is None else (
+            EWMA_ALPHA * first_chunk_seconds + (1 - EWMA_ALPHA) * self.latency_ewma
+        )
+        self.error_ewma *= 1 - EWMA_ALPHA
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.probing = False
+
+    def failed(self, now: float) -> None:
+        self.failures += 1
+        self.error_ewma = EWMA_ALPHA + (1 - EWMA_ALPHA) * self.error_ewma
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= BREAKER_FAILURES:
+            self.state = OPEN
+            self.opened_at = now
+        self.probing = False
+
+    def abandoned(self) -> None:
+        """The attempt was cancelled (lost a hedge, or the caller left): no verdict."""
+        self.probing = False
+
+    def score(self) -> float:
+        """Expected seconds to first chunk, inflated by the error rate. Untried backends score 0."""
+        if self.latency_ewma is None:
+            return 0.0
+        return self.latency_ewma / max(0.05, 1 - self.error_ewma)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    def stats(self) -> Dict:
+        p95 = self.percentile(0.95)
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_ewma": round(self.error_ewma, 3),
+        }
+
+
+# Streams one completion: (messages, model) -> chunks
+StreamFn = Callable[[List[Dict], str], AsyncIterator[Any]]
+
+
+class _Attempt:
+    """One backend's stream, with its first chunk fetched in a task so attempts can race."""
+
+    def __init__(self, backend: Tuple[str, str], health: BackendHealth, stream: AsyncIterator[Any]):
+        self.backend = backend
+        self.health = health
+        self.stream = stream
+        self.started_at = time.monotonic()
+        self.hedged = False
+        self.first = asyncio.ensure_future(stream.__anext__())
+        health.started()
+
+    async def cancel(self) -> None:
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        await self.stream.aclose()
+        self.health.abandoned()
+
+
+class LLMRouter:
+    """
+    Sends each completion to the backend (provider, model) with the lowest
+    score, skipping unconfigured ones and those with an open circuit. A
+    backend that fails before its first chunk is recorded as a failure and
+    the next one is tried; after the first chunk the stream is committed.
+
+    With hedge=True, if the chosen backend has produced nothing after its
+    own p95 time to first chunk, the runner-up is started as well. Whichever
+    yields first is streamed and the other is cancelled.
+    """
+
+    def __init__(self, backends: Sequence[Tuple[str, str]], providers: Dict[str, Tuple[Callable[[], bool], StreamFn]]):
+        self.backends = list(backends)
+        self.providers = providers
+        self.health: Dict[Tuple[str, str], BackendHealth] = {backend: BackendHealth() for backend in self.backends}
+        self.hedges = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def configured(self) -> List[Tuple[str, str]]:
+        return [backend for backend in self.backends if backend[0] in self.providers and self.providers[backend[0]][0]()]
+
+    def candidates(self) -> List[Tuple[str, str]]:
+        """Available backends, best first; configuration order breaks ties."""
+        now = time.monotonic()
+        available = [backend for backend in self.configured() if self.health[backend].available(now)]
+        return sorted(available, key=lambda backend: self.health[backend].score())
+
+    def _start(self, backend: Tuple[str, str], messages: List[Dict]) -> _Attempt:
+        provider, model = backend
+        return _Attempt(backend, self.health[backend], self.providers[provider][1](messages, model))
+
+    def _hedge_delay(self, backend: Tuple[str, str]) -> float:
+        p95 = self.health[backend].percentile(0.95)
+        return max(HEDGE_MIN_DELAY_SECONDS, p95 if p95 is not None else HEDGE_DEFAULT_DELAY_SECONDS)
+
+    async def stream(self, messages: List[Dict], hedge: bool = False) -> AsyncIterator[Tuple[Tuple[str, str], Any]]:
+        """Yields (backend, chunk) pairs from whichever backend answered."""
+        queue = self.candidates()
+        if not queue:
+            raise NoBackendAvailable("No LLM backend is available right now.")
+        hedge = hedge and HEDGE_ENABLED
+        running: List[_Attempt] = []
+        error: Optional[BaseException] = None
+        try:
+            # Race first chunks until one attempt produces one or all have failed
+            while True:
+                if not running:
+                    if not queue:
+                        break
+                    running.append(self._start(queue.pop(0), messages))
+                timeout = None
+                if hedge and len(running) == 1 and queue:
+                    timeout = max(0.0, running[0].started_at + self._hedge_delay(running[0].backend) - time.monotonic())
+                done, _ = await asyncio.wait([attempt.first for attempt in running], timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    hedge = False
+                    running.append(self._start(queue.pop(0), messages))
+                    running[-1].hedged = True
+                    continue
+                winner = None
+                for attempt in [attempt for attempt in running if attempt.first.done()]:
+                    exc = attempt.first.exception()
+                    if exc is None:
+                        if winner is None:
+                            running.remove(attempt)
+                            winner = attempt
+                        continue
+                    running.remove(attempt)
+                    if isinstance(exc, StopAsyncIteration):
+                        # An empty stream is still an answer
+                        attempt.health.succeeded(time.monotonic() - attempt.started_at)
+                        return
+                    attempt.health.failed(time.monotonic())
+                    error = exc
+                    if queue:
+                        self.failovers += 1
+                if winner is not None:
+                    break
+            if winner is None:
+                raise error if error is not None else NoBackendAvailable("No LLM backend is available right now.")
+        finally:
+            losers, running = running, []
+            for attempt in losers:
+                await attempt.cancel()
+
+        winner.health.succeeded(time.monotonic() - winner.started_at)
+        self.hedges_won += winner.hedged
+        try:
+            # Inside the try, so a consumer closing after the first chunk
+            # closes the winner's stream right away
+            yield winner.backend, winner.first.result()
+            async for chunk in winner.stream:
+                yield winner.backend, chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception:
+            # A stream that breaks after the first chunk counts against the backend
+            winner.health.failed(time.monotonic())
+            raise
+        finally:
+            await winner.stream.aclose()
+
+    def stats(self) -> Dict:
+        configured = set(self.configured())
+        return {
+            "hedging": HEDGE_ENABLED,
+            "hedges": self.hedges,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "backends": {
+                f"{provider}:{model}": {**health.stats(), "configured": (provider, model) in configured}
+                for (provider, model), health in self.health.items()
+            },
+        }
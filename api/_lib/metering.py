@@ -0,0 +1,209 @@
+# learn-rust-production-repo/api/_lib/metering.py
+
+import asyncio
+import datetime
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .supabase_pool import is_configured as supabase_is_configured, supabase_pool
+
+# Tokens each user may spend per UTC day (prompt + completion)
+DAILY_TOKEN_BUDGET = int(os.environ.get("AGENT_DAILY_TOKEN_BUDGET", "50000"))
+# Usage rows are written to Supabase once this many are pending...
+FLUSH_BATCH_SIZE = int(os.environ.get("AGENT_USAGE_FLUSH_BATCH", "50"))
+# ...or when the oldest pending row is this old
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("AGENT_USAGE_FLUSH_SECONDS", "30"))
+# Rows kept for retry while the sink is failing; the oldest are dropped beyond this
+MAX_PENDING_ROWS = int(os.environ.get("AGENT_USAGE_MAX_PENDING", "10000"))
+
+# Rough BPE approximation: words, numbers and single punctuation marks,
+# with long words split into ~4-character pieces.
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+# Per-message overhead of the chat format (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a user has spent their daily token budget."""
+
+    def __init__(self, user_id: str, used: int, budget: int):
+        super().__init__(f"Daily token budget of {budget} tokens used up ({used} used). Try again tomorrow.")
+        self.user_id = user_id
+        self.used = used
+        self.budget = budget
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """
+    Local token estimate, used before the provider reports real counts.
+    Cached because the same lesson passages and system prompts repeat.
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def estimate_messages_tokens(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class TokenReservation:
+    """Tokens held against a user's budget while their LLM call runs."""
+
+    def __init__(self, user_id: str, tokens: int):
+        self.user_id = user_id
+        self.tokens = tokens
+        self.settled = False
+
+
+def _today() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+class TokenMeter:
+    """
+    In-memory per-user daily token counters.
+
+    Every recorded call also becomes a usage row; rows are handed to `sink`
+    in batches (see flush_to_supabase) so the hot path never waits on I/O.
+    """
+
+    def __init__(self, budget: int = DAILY_TOKEN_BUDGET):
+        self.budget = budget
+        self.day = _today()
+        self._used: Dict[str, int] = {}
+        self._reserved: Dict[str, int] = {}
+        self._pending: List[Dict] = []
+        self._oldest_pending = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self.sink: Optional[Callable[[List[Dict]], Awaitable[None]]] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.rejected = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self.dropped_rows = 0
+
+    def _roll_day(self) -> None:
+        today = _today()
+        if today != self.day:
+            self.day = today
+            self._used.clear()
+
+    def used(self, user_id: str) -> int:
+        self._roll_day()
+        return self._used.get(user_id, 0)
+
+    def check(self, user_id: str, estimate: int = 0) -> None:
+        """
+        Raises TokenBudgetExceeded if `estimate` more tokens would go over
+        budget, counting tokens reserved by the user's calls still running.
+        """
+        used = self.used(user_id)
+        if used + self._reserved.get(user_id, 0) + estimate > self.budget:
+            self.rejected += 1
+            raise TokenBudgetExceeded(user_id, used, self.budget)
+
+    def reserve(self, user_id: str, estimate: int) -> TokenReservation:
+        """
+        Checks and holds `estimate` tokens before an LLM call, so concurrent
+        calls can't all pass the check before any of them is recorded.
+        Every reservation must be settle()d.
+        """
+        self.check(user_id, estimate)
+        self._reserved[user_id] = self._reserved.get(user_id, 0) + estimate
+        return TokenReservation(user_id, estimate)
+
+    def settle(self, reservation: TokenReservation, prompt_tokens: int, completion_tokens: int, model: str) -> None:
+        """Releases the reservation and records what the call actually used. Idempotent."""
+        if reservation.settled:
+            return
+        reservation.settled = True
+        left = self._reserved.get(reservation.user_id, 0) - reservation.tokens
+        if left > 0:
+            self._reserved[reservation.user_id] = left
+        else:
+            self._reserved.pop(reservation.user_id, None)
+        self.record(reservation.user_id, prompt_tokens, completion_tokens, model)
+
+    def record(self, user_id: str, prompt_tokens: int, completion_tokens: int, model: str) -> None:
+        self._roll_day()
+        total = prompt_tokens + completion_tokens
+        self._used[user_id] = self._used.get(user_id, 0) + total
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        if not self._pending:
+            self._oldest_pending = time.monotonic()
+        self._pending.append({
+            "user_id": user_id,
+            "usage_date": self.day,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        })
+        self._trim_pending()
+        if len(self._pending) >= FLUSH_BATCH_SIZE or time.monotonic() - self._oldest_pending >= FLUSH_INTERVAL_SECONDS:
+            self._schedule_flush()
+
+    def _trim_pending(self) -> None:
+        # The sink is down (or there is none): keep memory bounded
+        overflow = len(self._pending) - MAX_PENDING_ROWS
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped_rows += overflow
+
+    def _schedule_flush(self) -> None:
+        if self.sink is None or (self._flush_task and not self._flush_task.done()):
+            return
+        try:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # No event loop (e.g. a script): the next flush() call picks these up
+            pass
+
+    async def flush(self) -> None:
+        """
+        Hands all pending usage rows to the sink; rows are kept for retry if
+        it fails, up to MAX_PENDING_ROWS (the oldest are dropped).
+        """
+        if self.sink is None or not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self.sink(batch)
+            self.flushed_rows += len(batch)
+        except Exception:
+            self.flush_errors += 1
+            self._pending = batch + self._pending
+            self._trim_pending()
+        if self._pending:
+            self._oldest_pending = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "daily_budget": self.budget,
+            "day": self.day,
+            "users_today": len(self._used),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "rejected": self.rejected,
+            "reserved_tokens": sum(self._reserved.values()),
+            "pending_rows": len(self._pending),
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+            "dropped_rows": self.dropped_rows,
+        }
+
+
+async def flush_to_supabase(rows: List[Dict]) -> None:
+    """Batch-inserts usage rows into the `token_usage` table."""
+    client = await supabase_pool.client()
+    await supabase_pool.execute(client.table("token_usage").insert(rows))
+
+
+token_meter = TokenMeter()
+# Only persist usage when the backend has service-role credentials
+if supabase_is_configured():
+    token_meter.sink = flush_to_supabase
@@ -0,0 +1,77 @@
+# learn-rust-production-repo/api/_lib/prompts.py
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .corpus import SECTION_FIELDS, corpus_version, lessons_for_day, section_text
+
+SYSTEM_PROMPT = (
+    "You are a friendly Rust tutor for learnrust.online. "
+    "Answer the learner's question clearly and briefly, using the lesson context when it helps."
+)
+
+
+@lru_cache(maxsize=256)
+def _day_prefix(day_index: Optional[int], version: str) -> str:
+    parts = [SYSTEM_PROMPT]
+    for lesson in lessons_for_day(day_index):
+        sections = "\n\n".join(
+            f"[{section}]\n{text}" for section in SECTION_FIELDS if (text := section_text(lesson, section))
+        )
+        parts.append(f"Today's lesson: Day {lesson['day_index']} - {lesson['title']}\n\n{sections}")
+    return "\n\n---\n\n".join(parts)
+
+
+class PromptTemplates:
+    """
+    Builds agent prompts so providers can reuse their prefix cache.
+
+    Everything that is the same for every learner on a given day (the
+    instructions plus that day's full lesson) goes into one system message
+    that is rendered once per (day_index, corpus version) and memoized, so
+    it is byte-identical across requests. Only the retrieved extras, the
+    question and the code vary, and they come last.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.calls = 0
+
+    def prefix(self, day_index: Optional[int]) -> str:
+        return _day_prefix(day_index, corpus_version())
+
+    def build_messages(
+        self, day_index: Optional[int], passages: List[Dict], user_query: str, code: Optional[str]
+    ) -> List[Dict]:
+        # Passages from today's lesson are already in the prefix
+        extras = [p for p in passages if p["day_index"] != day_index]
+        tail = []
+        if extras:
+            notes = "\n\n".join(f"Day {p['day_index']} - {p['title']} [{p['section']}]\n{p['text']}" for p in extras)
+            tail.append(f"Related lesson notes:\n{notes}")
+        tail.append(f"Question: {user_query}")
+        if code:
+            tail.append(f"My code:\n```rust\n{code}\n```")
+        return [
+            {"role": "system", "content": self.prefix(day_index)},
+            {"role": "user", "content": "\n\n".join(tail)},
+        ]
+
+    def record_usage(self, usage: Dict) -> None:
+        """Tracks how many prompt tokens the provider served from its prefix cache."""
+        self.calls += 1
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.cached_tokens += usage.get("cached_tokens", 0)
+
+    def stats(self) -> Dict:
+        return {
+            "prefixes_memoized": _day_prefix.cache_info().currsize,
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "prefix_hit_rate": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+        }
+
+
+prompt_templates = PromptTemplates()
@@ -0,0 +1,245 @@
+# learn-rust-production-repo/api/_lib/ratelimit.py
+
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Tuple
+
+# Per-user token bucket: sustained requests per minute and burst size
+USER_RATE_PER_MINUTE = float(os.environ.get("AGENT_RATE_PER_MINUTE", "10"))
+USER_BURST = float(os.environ.get("AGENT_RATE_BURST", "5"))
+# Buckets of the non-LLM routes, separate from the agent's so that running
+# code doesn't use up questions (and vice versa): route -> (per minute, burst).
+# The execution pool's fair scheduler already keeps Run spam from one user
+# from delaying others; these only stop outright flooding.
+ROUTE_LIMITS = {
+    "run": (float(os.environ.get("EXEC_RATE_PER_MINUTE", "60")), float(os.environ.get("EXEC_RATE_BURST", "20"))),
+    "grade": (float(os.environ.get("GRADE_RATE_PER_MINUTE", "30")), float(os.environ.get("GRADE_RATE_BURST", "10"))),
+    "debug": (float(os.environ.get("DEBUG_RATE_PER_MINUTE", "20")), float(os.environ.get("DEBUG_RATE_BURST", "5"))),
+}
+# LLM-bound requests running at once (per worker), and how many may wait for a slot
+MAX_CONCURRENT_LLM = int(os.environ.get("AGENT_MAX_CONCURRENT", "16"))
+MAX_QUEUED_LLM = int(os.environ.get("AGENT_MAX_QUEUED", "32"))
+# "memory" (default) or "sqlite:/path/to/buckets.db" to share buckets between workers
+RATE_LIMIT_STORE = os.environ.get("AGENT_RATE_LIMIT_STORE", "memory")
+# How often the memory store drops buckets that have refilled completely
+BUCKET_SWEEP_SECONDS = 60.0
+
+
+class RateLimited(Exception):
+    """Request rejected by admission control; maps to 429/503 with Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in a dict. Fine for a single worker process. A bucket
+    that has refilled to capacity is the same as no bucket, so idle ones
+    are swept out every BUCKET_SWEEP_SECONDS instead of piling up per
+    client address.
+    """
+
+    # take() never blocks, so it runs on the event loop
+    blocking = False
+
+    def __init__(self, sweep_seconds: float = BUCKET_SWEEP_SECONDS):
+        # key -> (tokens, updated, time the bucket is full again)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self.sweep_seconds = sweep_seconds
+        self._next_sweep = time.monotonic() + sweep_seconds
+        self.evicted = 0
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Takes `cost` tokens if available. Returns (allowed, seconds until it would be)."""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+        tokens = _refill(tokens, updated, now, rate, capacity)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return (True, 0.0) if allowed else (False, (cost - tokens) / rate)
+
+    def _sweep(self, now: float) -> None:
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+        self.evicted += len(full)
+        self._next_sweep = now + self.sweep_seconds
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """
+    Token buckets in a SQLite file, shared by every worker on the host.
+    Each take() is one short IMMEDIATE transaction, so updates are atomic
+    across processes. take() can wait on the file lock, so the limiter runs
+    it in a worker thread (one connection per thread).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        # Wall clock, not monotonic: the timestamps are compared across processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(*row, now, rate, capacity) if row else capacity
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+def make_bucket_store(spec: str = RATE_LIMIT_STORE):
+    """Builds the bucket store named by AGENT_RATE_LIMIT_STORE."""
+    if spec.startswith("sqlite:"):
+        return SqliteBucketStore(spec[len("sqlite:"):])
+    if spec != "memory":
+        raise ValueError(f"Unknown AGENT_RATE_LIMIT_STORE: {spec!r}")
+    return MemoryBucketStore()
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent LLM-bound requests and sheds load once the wait queue
+    is full, instead of letting work pile up behind slow completions.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_LLM, max_queued: int = MAX_QUEUED_LLM):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.shed = 0
+        # EWMA of how long a request holds its slot, for Retry-After
+        self.avg_service_seconds = 2.0
+
+    async def acquire(self) -> "_Slot":
+        if self.active >= self.max_concurrent and self.queued >= self.max_queued:
+            self.shed += 1
+            waves = (self.queued + 1) / self.max_concurrent
+            raise RateLimited(503, self.avg_service_seconds * waves, "The tutor is busy right now, please retry shortly.")
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        return _Slot(self)
+
+    def _release(self, held_for: float) -> None:
+        self.active -= 1
+        self._semaphore.release()
+        self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * held_for
+
+    def stats(self) -> Dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "active": self.active,
+            "queued": self.queued,
+            "shed": self.shed,
+            "avg_service_seconds": round(self.avg_service_seconds, 3),
+        }
+
+
+class _Slot:
+    """A held concurrency slot. release() is idempotent, so streams can call it from several places."""
+
+    def __init__(self, limiter: ConcurrencyLimiter):
+        self._limiter = limiter
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release(time.monotonic() - self._started)
+
+
+class RateLimiter:
+    """
+    Per-user token buckets plus the global LLM concurrency cap. Each route
+    class ("agent", and those in ROUTE_LIMITS) has its own bucket per user.
+    """
+
+    def __init__(self, store=None, rate_per_minute: float = USER_RATE_PER_MINUTE, burst: float = USER_BURST):
+        self.store = store
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.routes = {route: (per_minute / 60.0, route_burst) for route, (per_minute, route_burst) in ROUTE_LIMITS.items()}
+        self.concurrency = ConcurrencyLimiter()
+        self.allowed = 0
+        self.limited = 0
+
+    async def check_user(self, user_id: str, route: str = "agent") -> None:
+        """Raises RateLimited (429) when the user's bucket for `route` is empty."""
+        if self.store is None:
+            self.store = make_bucket_store()
+        rate, burst = (self.rate, self.burst) if route == "agent" else self.routes[route]
+        key = f"{route}:{user_id}"
+        if self.store.blocking:
+            allowed, retry_after = await asyncio.to_thread(self.store.take, key, rate, burst)
+        else:
+            allowed, retry_after = self.store.take(key, rate, burst)
+        if not allowed:
+            self.limited += 1
+            detail = (
+                "Too many questions at once, please slow down a little." if route == "agent"
+                else "Too many requests at once, please slow down a little."
+            )
+            raise RateLimited(429, retry_after, detail)
+        self.allowed += 1
+
+    async def admit(self, user_id: str) -> _Slot:
+        """Per-user check, then a global slot. The caller must release() the slot."""
+        await self.check_user(user_id)
+        return await self.concurrency.acquire()
+
+    def stats(self) -> Dict:
+        return {"allowed": self.allowed, "limited": self.limited, **self.concurrency.stats()}
+
+
+# Guards the LLM-bound routes (/agent, /agent/stream and each /agent/batch item)
+rate_limiter = RateLimiter()
@@ -0,0 +1,157 @@
+# learn-rust-production-repo/api/_lib/scheduler.py
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+# Compile/run jobs one user may have executing at the same time
+USER_INFLIGHT_CAP = int(os.environ.get("EXEC_USER_INFLIGHT", "1"))
+# Signed-in learners get this many turns per round for every anonymous one
+AUTHENTICATED_WEIGHT = int(os.environ.get("EXEC_AUTHENTICATED_WEIGHT", "2"))
+# Recent queue waits kept for the percentiles in stats()
+WAIT_SAMPLES = 1024
+
+
+class RunSuperseded(Exception):
+    """A queued run was dropped because the same user submitted a newer one."""
+
+
+def weight_for(user_id: str) -> int:
+    return 1 if user_id.startswith("anon:") or user_id == "anonymous" else AUTHENTICATED_WEIGHT
+
+
+class _Ticket:
+    def __init__(self, user_id: str, group: str):
+        self.user_id = user_id
+        self.group = group
+        self.enqueued_at = time.monotonic()
+        self.granted = asyncio.get_running_loop().create_future()
+        self.wait_seconds = 0.0
+
+
+class FairScheduler:
+    """
+    Deficit round-robin over per-user queues in front of a fixed number of
+    execution slots. Each round a user with queued work earns `weight`
+    grants, so one user hammering Run waits behind everyone else's turn
+    instead of filling every slot. A user never holds more than
+    `user_cap` slots, and a newer submission in the same group (e.g. the
+    same editor) replaces that user's run still waiting in the queue.
+    """
+
+    def __init__(self, capacity: int, user_cap: int = USER_INFLIGHT_CAP):
+        self.capacity = capacity
+        self.user_cap = user_cap
+        # user id -> pending tickets, in round-robin order
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._deficit: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self.active = 0
+        self.granted = 0
+        self.superseded = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+    async def acquire(self, user_id: str, group: str = "run") -> _Ticket:
+        """
+        Waits for this user's turn and returns the ticket to release().
+        Raises RunSuperseded if a newer submission replaced this one first.
+        """
+        queue = self._queues.setdefault(user_id, deque())
+        for older in [ticket for ticket in queue if ticket.group == group]:
+            queue.remove(older)
+            # A waiter cancelled but not yet unwound has nothing left to tell
+            if not older.granted.done():
+                older.granted.set_exception(RunSuperseded("Replaced by a newer run from the same editor."))
+                self.superseded += 1
+        ticket = _Ticket(user_id, group)
+        queue.append(ticket)
+        self._dispatch()
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            # Client went away while queued (or after the grant raced the cancel)
+            if ticket.granted.done() and not ticket.granted.cancelled() and ticket.granted.exception() is None:
+                self.release(ticket)
+            else:
+                self._discard(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: _Ticket) -> None:
+        self.active -= 1
+        self._running[ticket.user_id] -= 1
+        if not self._running[ticket.user_id]:
+            del self._running[ticket.user_id]
+        self._dispatch()
+
+    def _discard(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+        self._drop_if_idle(ticket.user_id)
+
+    def _drop_if_idle(self, user_id: str) -> None:
+        if user_id in self._queues and not self._queues[user_id]:
+            del self._queues[user_id]
+            self._deficit.pop(user_id, None)
+
+    def _dispatch(self) -> None:
+        while self.active < self.capacity:
+            eligible = [
+                user_id for user_id, queue in self._queues.items()
+                if queue and self._running.get(user_id, 0) < self.user_cap
+            ]
+            if not eligible:
+                return
+            for user_id in eligible:
+                if self.active >= self.capacity:
+                    return
+                self._deficit[user_id] = self._deficit.get(user_id, 0) + weight_for(user_id)
+                queue = self._queues[user_id]
+                while (
+                    queue and self._deficit[user_id] >= 1 and self.active < self.capacity
+                    and self._running.get(user_id, 0) < self.user_cap
+                ):
+                    ticket = queue.popleft()
+                    if ticket.granted.done():
+                        # Cancelled while queued; granting it would leak the slot
+                        continue
+                    self._deficit[user_id] -= 1
+                    self._grant(ticket)
+                self._queues.move_to_end(user_id)
+                if not queue:
+                    self._drop_if_idle(user_id)
+                elif self._running.get(user_id, 0) >= self.user_cap:
+                    # Unused credit doesn't carry over while the user is capped
+                    self._deficit[user_id] = 0
+
+    def _grant(self, ticket: _Ticket) -> None:
+        ticket.wait_seconds = time.monotonic() - ticket.enqueued_at
+        self._waits.append(ticket.wait_seconds)
+        self.active += 1
+        self._running[ticket.user_id] = self._running.get(ticket.user_id, 0) + 1
+        self.granted += 1
+        ticket.granted.set_result(None)
+
+    def stats(self) -> Dict:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1) if waits else None
+
+        return {
+            "capacity": self.capacity,
+            "user_cap": self.user_cap,
+            "active": self.active,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "queued_users": len(self._queues),
+            "granted": self.granted,
+            "superseded": self.superseded,
+            "queue_wait_ms": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1] * 1000, 1) if waits else None,
+            },
+        }
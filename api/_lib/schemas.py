@@ -0,0 +1,33 @@
+# learn-rust-production-repo/api/_lib/schemas.py
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+# Longest question accepted by the agent routes, in characters
+MAX_QUERY_CHARS = 4000
+# Longest code or pasted diagnostics accepted alongside a question
+MAX_CODE_CHARS = 64 * 1024
+
+
+class AgentQuery(BaseModel):
+    """
+    Body of /agent and /agent/stream, and of each /agent/batch item.
+    Anything else (null, numbers, oversized strings) is rejected with 422
+    before it reaches the caches or the prompt builder.
+    """
+
+    query: str = Field(min_length=1, max_length=MAX_QUERY_CHARS)
+    code: Optional[str] = Field(None, max_length=MAX_CODE_CHARS)
+    diagnostics: Optional[str] = Field(None, max_length=MAX_CODE_CHARS)
+    day_index: Optional[int] = None
+
+    def to_query_data(self) -> Dict:
+        """The plain dict the agent pipeline reads (unset fields left out)."""
+        return self.model_dump(exclude_none=True)
+
+
+class AgentBatch(BaseModel):
+    """Body of /agent/batch; the batch size limit is checked by the route (413)."""
+
+    queries: List[AgentQuery] = Field(default_factory=list)
@@ -0,0 +1,164 @@
+# learn-rust-production-repo/api/_lib/semantic_cache.py
+
+import os
+import re
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+vector_index = lazy_import(f"{__package__}.vector_index")
+
+# Minimum cosine similarity for a paraphrase to reuse a cached answer
+SEMANTIC_THRESHOLD = float(os.environ.get("AGENT_SEMANTIC_THRESHOLD", "0.9"))
+# Answers remembered per lesson day
+SEMANTIC_CACHE_SIZE_PER_DAY = int(os.environ.get("AGENT_SEMANTIC_CACHE_SIZE", "256"))
+
+# Random-hyperplane LSH: each table hashes a vector to an N_BITS signature and
+# only entries sharing a bucket in some table are compared exactly.
+N_TABLES = 6
+N_BITS = 8
+
+# True stopwords only (plus "rust", which every question is about). Negations
+# and direction words ("to", "from", "into") are kept: they change the question.
+_STOP_WORDS = frozenset(
+    "a an the is are was be do does did i my me you your it its this that of in on at "
+    "for with please just really actually exactly rust".split()
+)
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_NEGATIONS = frozenset("not no never cannot without".split())
+
+
+def canonical_query(query: str) -> List[str]:
+    """Lower-cased content words in order, with "n't" spelled out as "not"."""
+    text = re.sub(r"n['’]t\b", " not", query.lower())
+    return [word for word in _WORD_RE.findall(text) if word not in _STOP_WORDS]
+
+
+def _query_features(words: List[str]) -> List[Tuple[str, float]]:
+    """
+    Words, character trigrams (typos, plurals) and word bigrams. The bigrams
+    make the embedding order-sensitive, so "String to i32" and "i32 to String"
+    differ; negations are weighted up so "can I not ..." differs from "can I ...".
+    """
+    features = []
+    for word in words:
+        features.append((word, 2.0 if word in _NEGATIONS else 1.0))
+        padded = f"#{word}#"
+        features.extend((f"3:{padded[i:i + 3]}", 0.25) for i in range(len(padded) - 2))
+    features.extend((f"2:{a} {b}", 1.0) for a, b in zip(words, words[1:]))
+    return features
+
+
+def embed_query(query: str):
+    """Signed feature hashing like vector_index.embed_texts, over _query_features."""
+    vector = np.zeros(vector_index.DIM, dtype=np.float32)
+    for feature, weight in _query_features(canonical_query(query)):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % vector_index.DIM] += weight if h & 0x80000000 else -weight
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _DayBucket:
+    """LSH tables plus bounded LRU storage for one lesson day."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (vector, signatures, value)
+        self.tables: List[Dict[int, set]] = [{} for _ in range(N_TABLES)]
+
+
+class SemanticCache:
+    """
+    Approximate nearest-neighbour cache of agent answers, scoped per day_index.
+
+    Lookups hash the query embedding into N_TABLES LSH tables, gather the
+    entries that collide in any table and return the best one whose cosine
+    similarity clears `threshold`.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_THRESHOLD, maxsize_per_day: int = SEMANTIC_CACHE_SIZE_PER_DAY):
+        self.threshold = threshold
+        self.maxsize_per_day = maxsize_per_day
+        self.version: Optional[str] = None
+        # Hyperplanes are drawn on first use so importing this module doesn't need numpy
+        self._planes = None
+        self._bit_weights = None
+        self._days: Dict[Optional[int], _DayBucket] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def bind_version(self, version: str) -> None:
+        """Forgets every answer when the lesson corpus changes."""
+        if version != self.version:
+            self._days.clear()
+            self.version = version
+
+    def _embed(self, query: str):
+        return embed_query(query)
+
+    def _signatures(self, vector) -> List[int]:
+        if self._planes is None:
+            rng = np.random.default_rng(0)
+            self._planes = rng.standard_normal((N_TABLES * N_BITS, vector_index.DIM)).astype(np.float32)
+            self._bit_weights = 1 << np.arange(N_BITS)
+        bits = (self._planes @ vector > 0).reshape(N_TABLES, N_BITS)
+        return [int(sig) for sig in bits @ self._bit_weights]
+
+    def get(self, query: str, day_index: Optional[int]) -> Optional[Any]:
+        bucket = self._days.get(day_index)
+        vector = self._embed(query)
+        if bucket is None or not vector.any():
+            self.misses += 1
+            return None
+        candidates = set()
+        for table, signature in zip(bucket.tables, self._signatures(vector)):
+            candidates |= table.get(signature, set())
+        best_id, best_score = None, self.threshold
+        for entry_id in candidates:
+            score = float(bucket.entries[entry_id][0] @ vector)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+        if best_id is None:
+            self.misses += 1
+            return None
+        bucket.entries.move_to_end(best_id)
+        self.hits += 1
+        return bucket.entries[best_id][2]
+
+    def set(self, query: str, day_index: Optional[int], value: Any) -> None:
+        vector = self._embed(query)
+        if not vector.any():
+            return
+        bucket = self._days.setdefault(day_index, _DayBucket())
+        signatures = self._signatures(vector)
+        entry_id = self._next_id
+        self._next_id += 1
+        bucket.entries[entry_id] = (vector, signatures, value)
+        for table, signature in zip(bucket.tables, signatures):
+            table.setdefault(signature, set()).add(entry_id)
+        while len(bucket.entries) > self.maxsize_per_day:
+            old_id, (_, old_signatures, _) = bucket.entries.popitem(last=False)
+            for table, signature in zip(bucket.tables, old_signatures):
+                table[signature].discard(old_id)
+                if not table[signature]:
+                    del table[signature]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "days": len(self._days),
+            "size": sum(len(bucket.entries) for bucket in self._days.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Paraphrase cache behind the exact response_cache
+semantic_cache = SemanticCache()
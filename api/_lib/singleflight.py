@@ -0,0 +1,112 @@
+# learn-rust-production-repo/api/_lib/singleflight.py
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class _Flight:
+    """One in-flight computation whose events are replayed to every subscriber."""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Any) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work: callers with the same key share one
+    producer, which runs in its own task and fans its events out to all of them.
+
+    The producer is only cancelled when every subscriber has gone away, so one
+    client disconnecting never cancels the answer for the others.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.requests = 0
+        self.flights = 0
+        self.abandoned = 0
+
+    async def stream(self, key: Hashable, producer: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        self.requests += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._start(key, producer)
+        flight.subscribers += 1
+        try:
+            async for event in flight.subscribe():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more: stop paying for the work.
+                # Forget the flight first, so a caller arriving before the
+                # task unwinds starts a fresh one instead of joining the
+                # cancelled one.
+                self.abandoned += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _start(self, key: Hashable, producer: Callable[[], AsyncIterator[Any]]) -> _Flight:
+        flight = _Flight()
+        self._flights[key] = flight
+        self.flights += 1
+
+        async def run():
+            try:
+                async for event in producer():
+                    flight.publish(event)
+                flight.finish()
+            except BaseException as e:
+                flight.finish(e)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+            finally:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        flight.task = asyncio.get_running_loop().create_task(run())
+        return flight
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "flights": self.flights,
+            "in_flight": len(self._flights),
+            "abandoned": self.abandoned,
+            "fan_in_ratio": round(self.requests / self.flights, 4) if self.flights else 0.0,
+        }
+
+
+# Shared by /agent and /agent/stream, keyed by the response cache key
+agent_flights = SingleFlight()
@@ -0,0 +1,65 @@
+# learn-rust-production-repo/api/_lib/snapshot.py
+#
+# Prebuilt retrieval indexes shipped with the deployment, so a cold start
+# memory-maps them instead of re-chunking and re-embedding every lesson.
+#
+# Regenerate after editing any lesson file (from the repo root):
+#   python -m api._lib.snapshot
+# A stale snapshot is never served: it is ignored when its corpus version
+# doesn't match, and the indexes are rebuilt on first use instead.
+
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from .corpus import corpus_version, lesson_passages
+
+SNAPSHOT_DIR = Path(os.environ.get("AGENT_SNAPSHOT_DIR", Path(__file__).resolve().parents[1] / "_snapshot"))
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+
+
+@lru_cache(maxsize=1)
+def _read_manifest() -> Optional[Dict]:
+    try:
+        return json.loads((SNAPSHOT_DIR / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def load_manifest(version: str) -> Optional[Dict]:
+    """Returns the snapshot manifest if one exists for this corpus version."""
+    manifest = _read_manifest()
+    if manifest is None or manifest.get("version") != version:
+        return None
+    return manifest
+
+
+def write_snapshot(directory: Path = SNAPSHOT_DIR) -> Dict:
+    """Builds the vector and BM25 indexes for the current corpus and writes them to `directory`."""
+    import numpy as np
+
+    from .bm25 import BM25Index
+    from .vector_index import DIM, VectorIndex
+
+    passages = lesson_passages()
+    vectors = VectorIndex.build(passages)
+    bm25 = BM25Index(passages)
+    manifest = {
+        "version": corpus_version(),
+        "dim": DIM,
+        "passages": passages,
+        "bm25": bm25.to_state(),
+    }
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / VECTORS_FILE, vectors.matrix)
+    (directory / MANIFEST_FILE).write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    _read_manifest.cache_clear()
+    return manifest
+
+
+if __name__ == "__main__":
+    manifest = write_snapshot()
+    print(f"Wrote snapshot {manifest['version']} ({len(manifest['passages'])} passages) to {SNAPSHOT_DIR}")
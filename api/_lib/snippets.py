@@ -0,0 +1,288 @@
+# learn-rust-production-repo/api/_lib/snippets.py
+#
+# Compiles and runs every lesson's core and pitfall example. Core examples
+# must build and run cleanly; pitfalls must fail the way the lesson says
+# (a specific rustc error code, a lint, or a runtime panic). The results,
+# including each example's real output, are written next to the retrieval
+# snapshot and served by /api/lessons/{day}/snippets, so the UI never has
+# to execute anything when a lesson is viewed.
+#
+# Re-verify after editing any lesson file (from the repo root):
+#   python -m api._lib.snippets
+# Results are keyed by a hash of the wrapped snippet and the toolchain, so
+# only changed examples are compiled again.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .corpus import load_lessons
+from .snapshot import SNAPSHOT_DIR
+
+SNIPPETS_FILE = "snippets.json"
+# Wall-clock limits for one snippet's compile and run
+COMPILE_TIMEOUT_SECONDS = 60
+RUN_TIMEOUT_SECONDS = 5
+# Output kept per snippet for display
+OUTPUT_CHARS = 4000
+
+# Files present in the working directory when a snippet runs
+SNIPPET_FIXTURES = {"notes.txt": "Ownership, borrowing and lifetimes.\n"}
+
+# How each pitfall is supposed to go wrong, keyed by (source module, day).
+# "E0xxx" (or a deny-by-default lint name) is a compile error that must be
+# reported, "lint:<name>" a warning that must fire, "panic" a runtime panic,
+# "compiles" a design mistake the compiler accepts. "needs-context" marks
+# fragments that use items defined elsewhere in the lesson: they are
+# compiled for display but not asserted. Unlisted pitfalls must fail somehow.
+PITFALL_EXPECTATIONS: Dict[tuple, str] = {
+    ("lesson_data", 2): "E0384",
+    ("lesson_data", 3): "overflowing_literals",
+    ("lesson_data", 4): "lint:unused_must_use",
+    ("lesson_data", 5): "E0308",
+    ("lessons_6_12", 6): "E0308",
+    ("lessons_6_12", 7): "lint:unreachable_code",
+    ("lessons_6_12", 8): "E0382",
+    ("lessons_6_12", 9): "E0502",
+    ("lessons_6_12", 10): "E0308",
+    ("lessons_6_12", 11): "panic",
+    ("lessons_6_12", 12): "E0599",
+    ("lessons_13_20", 11): "E0382",
+    ("lessons_13_20", 12): "E0502",
+    ("lessons_13_20", 13): "E0106",
+    ("lessons_13_20", 14): "E0308",
+    ("lessons_13_20", 15): "E0603",
+    ("lessons_13_20", 16): "panic",
+    ("lessons_13_20", 17): "E0277",
+    ("lessons_13_20", 18): "E0609",
+    ("lessons_13_20", 19): "needs-context",
+    ("lessons_13_20", 20): "needs-context",
+    ("lessons_21_30", 21): "E0004",
+    ("lessons_21_30", 22): "E0502",
+    ("lessons_21_30", 23): "needs-context",
+    ("lessons_21_30", 24): "panic",
+    ("lessons_21_30", 25): "panic",
+    ("lessons_21_30", 26): "E0369",
+    ("lessons_21_30", 27): "compiles",
+    ("lessons_21_30", 28): "needs-context",
+    ("lessons_21_30", 29): "needs-context",
+    ("lessons_21_30", 30): "panic",
+}
+
+
+def snippet_kind_is_rust(code: str) -> bool:
+    """Shell transcripts (`$ cargo run`) are shown as-is and never compiled."""
+    return not any(line.lstrip().startswith("$ ") for line in code.splitlines())
+
+
+def wrap_snippet(code: str) -> str:
+    """
+    Fragments without `fn main` are placed inside one; items (structs, enums,
+    fns, impls, use) are all legal inside a function body, so the whole
+    fragment can go in unchanged.
+    """
+    if re.search(r"\bfn\s+main\s*\(", code):
+        return code
+    body = "\n".join(f"    {line}" if line else "" for line in code.splitlines())
+    if re.search(r"\?\s*[;.)]", code):
+        # Fragments using `?` need a main that returns a Result
+        return f"fn main() -> Result<(), Box<dyn std::error::Error>> {{\n{body}\n    Ok(())\n}}\n"
+    return f"fn main() {{\n{body}\n}}\n"
+
+
+def _rustc_version() -> str:
+    rustc = shutil.which("rustc")
+    if rustc is None:
+        return "unknown"
+    return subprocess.run([rustc, "--version"], capture_output=True, text=True).stdout.strip()
+
+
+def snippet_key(source: str, toolchain: str) -> str:
+    material = json.dumps({"source": source, "toolchain": toolchain, "fixtures": SNIPPET_FIXTURES}, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def lesson_snippets() -> List[Dict]:
+    """Every core and pitfall example, with its wrapped source and expectation."""
+    snippets = []
+    for lesson in load_lessons():
+        for kind, field in (("core", "core_example"), ("pitfall", "pitfall_example")):
+            code = (lesson.get(field) or {}).get("code", "")
+            if not code.strip():
+                continue
+            rust = snippet_kind_is_rust(code)
+            snippets.append({
+                "id": f"{lesson['source']}:{lesson['day_index']}:{kind}",
+                "day_index": lesson["day_index"],
+                "source": lesson["source"],
+                "kind": kind,
+                "code": code,
+                "wrapped": wrap_snippet(code) if rust else None,
+                "expect": "success" if kind == "core" else PITFALL_EXPECTATIONS.get(
+                    (lesson["source"], lesson["day_index"]), "failure"
+                ),
+            })
+    return snippets
+
+
+def compile_and_run(wrapped: str) -> Dict:
+    """
+    Process-pool worker: compiles one wrapped snippet with JSON diagnostics
+    and, if it builds, runs it. Returns error codes, lint names and output.
+    """
+    with tempfile.TemporaryDirectory(prefix="snippet-") as workdir:
+        (Path(workdir) / "src").mkdir()
+        (Path(workdir) / "src" / "main.rs").write_text(wrapped, encoding="utf-8")
+        for name, content in SNIPPET_FIXTURES.items():
+            (Path(workdir) / name).write_text(content, encoding="utf-8")
+        binary = Path(workdir) / "main"
+        try:
+            # A relative source path keeps diagnostics and panic locations stable
+            compiled = subprocess.run(
+                ["rustc", "--edition", "2021", "--crate-type", "bin", "--error-format=json", "-C", "debuginfo=0",
+                 "-o", str(binary), "src/main.rs"],
+                capture_output=True, text=True, timeout=COMPILE_TIMEOUT_SECONDS, cwd=workdir,
+            )
+        except subprocess.TimeoutExpired:
+            return {"outcome": "compile_timeout", "error_codes": [], "lints": [], "diagnostics": ""}
+
+        error_codes, lints, rendered = [], [], []
+        for line in compiled.stderr.splitlines():
+            try:
+                diagnostic = json.loads(line)
+            except ValueError:
+                continue
+            code = (diagnostic.get("code") or {}).get("code")
+            if diagnostic.get("level") == "error" and code:
+                error_codes.append(code)
+            elif diagnostic.get("level") == "warning" and code:
+                lints.append(code)
+            if diagnostic.get("rendered"):
+                rendered.append(diagnostic["rendered"])
+        result = {
+            "error_codes": sorted(set(error_codes)),
+            "lints": sorted(set(lints)),
+            "diagnostics": "".join(rendered)[:OUTPUT_CHARS],
+        }
+        if compiled.returncode != 0:
+            return {**result, "outcome": "compile_error"}
+
+        try:
+            ran = subprocess.run(
+                [str(binary)], capture_output=True, text=True, timeout=RUN_TIMEOUT_SECONDS,
+                cwd=workdir, stdin=subprocess.DEVNULL, env={"PATH": "/usr/bin:/bin", "RUST_BACKTRACE": "0"},
+            )
+        except subprocess.TimeoutExpired:
+            return {**result, "outcome": "timeout"}
+        return {
+            **result,
+            "outcome": "panic" if ran.returncode == 101 else ("ok" if ran.returncode == 0 else "runtime_error"),
+            "exit_code": ran.returncode,
+            "stdout": ran.stdout[:OUTPUT_CHARS],
+            "stderr": ran.stderr[:OUTPUT_CHARS],
+        }
+
+
+def check_expectation(expect: str, result: Dict) -> Optional[str]:
+    """None when the result matches the expectation, otherwise what went wrong."""
+    outcome = result["outcome"]
+    if expect == "needs-context":
+        return None
+    if expect == "compiles":
+        return None if outcome == "ok" else f"expected it to compile and run, got {outcome} {result['error_codes']}"
+    if expect == "success":
+        return None if outcome == "ok" else f"expected a clean run, got {outcome} {result['error_codes']}".rstrip()
+    if expect == "failure":
+        return None if outcome != "ok" else "expected the pitfall to fail, but it ran cleanly"
+    if expect == "panic":
+        return None if outcome == "panic" else f"expected a panic, got {outcome}"
+    if expect.startswith("lint:"):
+        return None if expect[5:] in result["lints"] else f"expected warning {expect[5:]}, got {result['lints']}"
+    return None if expect in result["error_codes"] else f"expected {expect}, got {outcome} {result['error_codes']}"
+
+
+def verify_snippets(previous: Optional[Dict] = None, jobs: Optional[int] = None) -> Dict:
+    """
+    Verifies every lesson snippet, reusing results from `previous` (an
+    earlier snippets.json) whose hash still matches. Returns the new file.
+    """
+    toolchain = _rustc_version()
+    reusable = {entry["hash"]: entry["result"] for entry in (previous or {}).get("snippets", []) if "result" in entry}
+    snippets = lesson_snippets()
+    pending = {}
+    for snippet in snippets:
+        if snippet["wrapped"] is None:
+            continue
+        snippet["hash"] = snippet_key(snippet["wrapped"], toolchain)
+        if snippet["hash"] not in reusable:
+            pending[snippet["hash"]] = snippet["wrapped"]
+
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        fresh = dict(zip(pending, pool.map(compile_and_run, pending.values())))
+
+    entries = []
+    for snippet in snippets:
+        entry = {key: snippet[key] for key in ("id", "day_index", "source", "kind", "expect")}
+        if snippet["wrapped"] is None:
+            entries.append({**entry, "skipped": "not Rust source"})
+            continue
+        result = reusable.get(snippet["hash"]) or fresh[snippet["hash"]]
+        entries.append({
+            **entry,
+            "hash": snippet["hash"],
+            "result": result,
+            "problem": check_expectation(snippet["expect"], result),
+        })
+    return {"toolchain": toolchain, "snippets": entries, "compiled": len(pending)}
+
+
+@lru_cache(maxsize=1)
+def _read_snippets() -> Optional[Dict]:
+    try:
+        return json.loads((SNAPSHOT_DIR / SNIPPETS_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def snippets_for_day(day_index: int) -> List[Dict]:
+    """Precomputed snippet results for one day, for display."""
+    data = _read_snippets()
+    if data is None:
+        return []
+    return [entry for entry in data["snippets"] if entry["day_index"] == day_index]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile and run every lesson snippet.")
+    parser.add_argument("--jobs", type=int, default=None, help="parallel compiler processes (default: CPU count)")
+    parser.add_argument("--no-write", action="store_true", help="only report, don't update the snippets file")
+    args = parser.parse_args(argv)
+
+    path = SNAPSHOT_DIR / SNIPPETS_FILE
+    data = verify_snippets(_read_snippets(), jobs=args.jobs)
+    problems = [entry for entry in data["snippets"] if entry.get("problem")]
+    for entry in problems:
+        print(f"FAIL {entry['id']}: {entry['problem']}")
+    unchecked = sum(1 for entry in data["snippets"] if entry["expect"] == "needs-context" or "skipped" in entry)
+    print(
+        f"{len(data['snippets'])} snippets, {data['compiled']} compiled, "
+        f"{unchecked} not asserted, {len(problems)} problems"
+    )
+    if not args.no_write:
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        _read_snippets.cache_clear()
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
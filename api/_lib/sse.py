@@ -0,0 +1,9 @@
+# learn-rust-production-repo/api/_lib/sse.py
+
+import json
+from typing import Dict
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """Encodes one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,76 @@
+# learn-rust-production-repo/api/_lib/supabase_pool.py
+
+import asyncio
+import os
+from typing import Optional
+
+SUPABASE_URL = os.environ.get("VITE_SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")  # Backend only, never sent to the browser
+
+# Connection pool limits for the shared HTTP/2 client
+POOL_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_POOL_MAX_KEEPALIVE", "10"))
+POOL_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60"))
+# Default per-call timeout; execute() can override it per query
+SUPABASE_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "5"))
+
+
+def is_configured() -> bool:
+    return bool(SUPABASE_URL and SUPABASE_KEY)
+
+
+class SupabasePool:
+    """
+    One async Supabase client per process, sharing a keep-alive HTTP/2
+    connection pool across requests (unlike lessons/upload_lessons.py,
+    which is a one-off script and can afford a sync client).
+
+    The client is created on first use, so cold starts that never touch
+    Supabase don't import it, and closed by the app lifespan on shutdown.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._http = None
+        self._lock = asyncio.Lock()
+
+    async def client(self):
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    await self._start()
+        return self._client
+
+    async def _start(self) -> None:
+        import httpx
+        from supabase import AsyncClientOptions, acreate_client
+
+        self._http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS),
+        )
+        self._client = await acreate_client(
+            SUPABASE_URL, SUPABASE_KEY, options=AsyncClientOptions(httpx_client=self._http)
+        )
+
+    async def execute(self, query, timeout: Optional[float] = None):
+        """
+        Runs a PostgREST query builder, e.g.
+        `await supabase_pool.execute(client.table("lessons").select("*").eq("day_index", 3))`,
+        giving up after `timeout` seconds.
+        """
+        return await asyncio.wait_for(query.execute(), timeout or SUPABASE_TIMEOUT_SECONDS)
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+        self._client = None
+        self._http = None
+
+
+supabase_pool = SupabasePool()
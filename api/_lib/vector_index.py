@@ -0,0 +1,144 @@
+# learn-rust-production-repo/api/_lib/vector_index.py
+
+import json
+import os
+import re
+import tempfile
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .corpus import corpus_version, lesson_passages
+from .snapshot import SNAPSHOT_DIR, VECTORS_FILE, load_manifest
+
+# Embedding width. 512 float16 columns keeps the whole lesson matrix well under 1 MB.
+DIM = 512
+
+# Where built indexes are written and memory-mapped from. /tmp is the only
+# writable location on Vercel.
+INDEX_DIR = Path(os.environ.get("AGENT_INDEX_DIR", Path(tempfile.gettempdir()) / "learnrust-index"))
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it my of on or so "
+    "that the this to what when where which why will with you your".split()
+)
+
+
+def _features(text: str) -> List[Tuple[str, float]]:
+    """Hashed features for one text: whole words plus character trigrams for fuzzy matches."""
+    features = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOP_WORDS:
+            continue
+        features.append((word, 1.0))
+        padded = f"#{word}#"
+        features.extend((f"3:{padded[i:i + 3]}", 0.25) for i in range(len(padded) - 2))
+    return features
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """
+    Embeds texts with signed feature hashing into L2-normalised float32 rows.
+
+    This is a model-free embedder: it needs no download and gives the same
+    vectors in every process (crc32, not Python's salted hash()).
+    """
+    matrix = np.zeros((len(texts), DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, weight in _features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            matrix[row, h % DIM] += weight if h & 0x80000000 else -weight
+    # Sublinear term frequency, then unit length so dot product == cosine
+    np.copyto(matrix, np.sign(matrix) * np.log1p(np.abs(matrix)))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """Dense passage index: one contiguous float16 matrix plus passage metadata."""
+
+    def __init__(self, matrix: np.ndarray, passages: List[Dict]):
+        self.matrix = matrix
+        self.passages = passages
+
+    @classmethod
+    def build(cls, passages: List[Dict]) -> "VectorIndex":
+        texts = [f"{p['title']}\n{p['topic_slug']}\n{p['text']}" for p in passages]
+        return cls(np.ascontiguousarray(embed_texts(texts), dtype=np.float16), passages)
+
+    def save(self, directory: Path, version: str) -> None:
+        """Writes the matrix as .npy (so it can be memory-mapped) and passages as JSON."""
+        directory.mkdir(parents=True, exist_ok=True)
+        # Write to temp names and rename, so a concurrent loader never sees half a file
+        vectors_tmp = directory / f".vectors-{version}.{os.getpid()}.npy"
+        passages_tmp = directory / f".passages-{version}.{os.getpid()}.json"
+        np.save(vectors_tmp, self.matrix)
+        passages_tmp.write_text(json.dumps(self.passages, ensure_ascii=False), encoding="utf-8")
+        os.replace(passages_tmp, directory / f"passages-{version}.json")
+        os.replace(vectors_tmp, directory / f"vectors-{version}.npy")
+
+    @classmethod
+    def load(cls, directory: Path, version: str) -> Optional["VectorIndex"]:
+        """Memory-maps a saved index, or returns None if there is none for this version."""
+        vectors_path = directory / f"vectors-{version}.npy"
+        passages_path = directory / f"passages-{version}.json"
+        if not (vectors_path.exists() and passages_path.exists()):
+            return None
+        matrix = np.load(vectors_path, mmap_mode="r")
+        passages = json.loads(passages_path.read_text(encoding="utf-8"))
+        return cls(matrix, passages)
+
+    def search_batch(self, queries: Sequence[str], k: int = 4) -> List[List[Dict]]:
+        """
+        Returns the top-k passages for every query, scoring all of them with a
+        single (queries x DIM) @ (DIM x passages) product.
+        """
+        if not queries or not self.passages:
+            return [[] for _ in queries]
+        scores = embed_texts(queries) @ self.matrix.T.astype(np.float32)
+        k = min(k, len(self.passages))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            results.append([
+                {**self.passages[i], "score": round(float(scores[row, i]), 4)}
+                for i in ranked if scores[row, i] > 0
+            ])
+        return results
+
+    def search(self, query: str, k: int = 4) -> List[Dict]:
+        return self.search_batch([query], k)[0]
+
+
+def get_index() -> VectorIndex:
+    """
+    Returns the process-wide lesson index, memory-mapped from the deployed
+    snapshot or, failing that, from INDEX_DIR.
+
+    Both are keyed by corpus_version(), so editing a lesson file rebuilds
+    the index instead of serving stale vectors.
+    """
+    return _index_for_version(corpus_version())
+
+
+@lru_cache(maxsize=1)
+def _index_for_version(version: str) -> VectorIndex:
+    manifest = load_manifest(version)
+    if manifest is not None and manifest["dim"] == DIM:
+        return VectorIndex(np.load(SNAPSHOT_DIR / VECTORS_FILE, mmap_mode="r"), manifest["passages"])
+    index = VectorIndex.load(INDEX_DIR, version)
+    if index is None:
+        index = VectorIndex.build(lesson_passages())
+        try:
+            index.save(INDEX_DIR, version)
+            index = VectorIndex.load(INDEX_DIR, version)
+        except OSError:
+            # Read-only filesystem: keep serving from the in-memory build
+            pass
+    return index
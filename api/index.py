@@ -1,38 +1,365 @@
 # learn-rust-production-repo/api/index.py
 
-from fastapi import FastAPI, HTTPException
-from typing import Dict
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Dict, List, Optional
+
+# Vercel runs this file directly, so make the repo root importable for api._lib
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api._lib.agent import (  # noqa: E402
+    agent_events,
+    answer_paths,
+    check_batch_token_budget,
+    check_token_budget,
+    parse_day_index,
+    run_agent_batch,
+    run_agent_pipeline,
+)
+from api._lib.auth import get_user_id  # noqa: E402
+from api._lib.bm25 import get_bm25_index  # noqa: E402
+from api._lib.build_cache import build_cache, crate_set_for_day  # noqa: E402
+from api._lib.cache import response_cache  # noqa: E402
+from api._lib.compile_cache import compile_cache  # noqa: E402
+from api._lib.deadline import Deadline, cancel_on_disconnect, deadline_stats  # noqa: E402
+from api._lib.debugger import submit_debug_job  # noqa: E402
+from api._lib.executor import EXEC_PREWARM, execution_pool  # noqa: E402
+from api._lib.grading import grade_submission, test_cases_for_day  # noqa: E402
+from api._lib.idempotency import (  # noqa: E402
+    IdempotencyConflict,
+    idempotency_key,
+    idempotency_store,
+    request_fingerprint,
+)
+from api._lib.jobs import FAILED, SUCCEEDED, job_queue, public_job  # noqa: E402
+from api._lib.llm import close_clients as close_llm_clients  # noqa: E402
+from api._lib.llm import router as llm_router  # noqa: E402
+from api._lib.metering import TokenBudgetExceeded, token_meter  # noqa: E402
+from api._lib.prompts import prompt_templates  # noqa: E402
+from api._lib.ratelimit import RateLimited, rate_limiter  # noqa: E402
+from api._lib.scheduler import RunSuperseded  # noqa: E402
+from api._lib.schemas import AgentBatch, AgentQuery  # noqa: E402
+from api._lib.semantic_cache import semantic_cache  # noqa: E402
+from api._lib.singleflight import agent_flights  # noqa: E402
+from api._lib.snippets import snippets_for_day  # noqa: E402
+from api._lib.sse import format_sse  # noqa: E402
+from api._lib.supabase_pool import supabase_pool  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients are created lazily on first use; shutdown closes them
+    if EXEC_PREWARM:
+        # Crate sets build in the background; runs use std until they're ready
+        build_cache.prebuild()
+        await execution_pool.start()
+    yield
+    await execution_pool.close()
+    await job_queue.shutdown()
+    await token_meter.flush()
+    await supabase_pool.close()
+    await close_llm_clients()
 
 # Vercel will use this 'app' instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(TokenBudgetExceeded)
+async def token_budget_exceeded(request: Request, exc: TokenBudgetExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"status": "error", "detail": str(exc), "tokens_used_today": exc.used, "daily_budget": exc.budget},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited(request: Request, exc: RateLimited):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict(request: Request, exc: IdempotencyConflict):
+    return JSONResponse(status_code=422, content={"status": "error", "detail": str(exc)})
+
+def parse_idempotency_key(request: Request) -> Optional[str]:
+    try:
+        return idempotency_key(request.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_idempotent(scope: tuple, body: Dict, compute, response: Response):
+    """Runs `compute` once per scope; repeats with the same body share or replay its result."""
+    result, replayed = await idempotency_store.run(scope, request_fingerprint(body), compute)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
 
 # Example endpoint for the agent
 # Accessible at: your-app.vercel.app/api/agent
 @app.post("/agent")
-async def run_agent(query_data: Dict):
-    """Handles the main agent logic (RAG, tool calls, LLM inference)."""
-    try:
-        # 1. Retrieve data from Supabase (Memory/RAG)
-        # 2. Call LLM (Gemini/OpenAI) with context
-        # 3. If code submitted, call Debugger Tool
-        
-        user_query = query_data.get("query", "No query provided")
-        
-        # --- (Your Agentic Logic Here) ---
-        
-        response = {
-            "status": "success",
-            "agent_response": f"Processing query: '{user_query}'. This response comes from the FastAPI Agent!",
-            "tokens_used": 42
+async def run_agent(body: AgentQuery, request: Request, response: Response):
+    """Handles the main agent logic (RAG, tool calls, LLM inference).
+    The X-Deadline-Ms header sets the time budget; see api/_lib/deadline.py.
+    Retries carrying the same Idempotency-Key share one run and replay its response."""
+    query_data = body.to_query_data()
+    deadline = Deadline.from_headers(request.headers)
+    user_id = get_user_id(request)
+    key = parse_idempotency_key(request)
+
+    async def answer():
+        check_token_budget(query_data, user_id)
+        slot = await rate_limiter.admit(user_id)
+        try:
+            return await run_agent_pipeline(query_data, user_id, deadline=deadline)
+        except TokenBudgetExceeded:
+            # The full prompt (with retrieved notes) didn't fit: 429, not 500
+            raise
+        except Exception as e:
+            # Good practice: handle errors gracefully
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            slot.release()
+
+    if key is None:
+        result = await cancel_on_disconnect(request, answer())
+    else:
+        result = await cancel_on_disconnect(request, run_idempotent(("agent", user_id, key), query_data, answer, response))
+    if result is None:
+        # Client went away; nobody will read this
+        return JSONResponse(status_code=499, content={"status": "error", "detail": "Client closed request."})
+    return result
+
+# Streaming variant of /agent: same pipeline, sent as Server-Sent Events
+# Accessible at: your-app.vercel.app/api/agent/stream
+@app.post("/agent/stream")
+async def stream_agent(body: AgentQuery, request: Request):
+    """Streams retrieval results, LLM tokens and tool events as SSE frames.
+    A dropped connection cancels the stream, and with it the LLM call."""
+    query_data = body.to_query_data()
+    deadline = Deadline.from_headers(request.headers)
+    user_id = get_user_id(request)
+    check_token_budget(query_data, user_id)
+    # The slot is held for the whole stream
+    slot = await rate_limiter.admit(user_id)
+
+    async def frames():
+        try:
+            async for event, data in agent_events(query_data, user_id, deadline=deadline):
+                yield format_sse(event, data)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            slot.release()
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also release if the stream never started (release is idempotent)
+        background=BackgroundTask(slot.release),
+    )
+
+# Most queries accepted by one /agent/batch call
+MAX_BATCH_SIZE = 50
+
+# Batch variant of /agent, for the teacher dashboard and content QA scripts
+# Accessible at: your-app.vercel.app/api/agent/batch
+@app.post("/agent/batch")
+async def run_agent_batch_endpoint(batch: AgentBatch, request: Request):
+    """Answers a list of agent queries concurrently; results come back in request order."""
+    items: List[Dict] = [item.to_query_data() for item in batch.queries]
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} queries per batch.")
+    user_id = get_user_id(request)
+    check_batch_token_budget(items, user_id)
+    deadline = Deadline.from_headers(request.headers)
+    # Rate limits and LLM slots are taken per item (see run_agent_batch)
+    return {"status": "success", "results": await run_agent_batch(items, user_id, deadline)}
+
+# Debugger Tool as an async job: compile + clippy + LLM explanation
+# Accessible at: your-app.vercel.app/api/jobs/debug
+@app.post("/api/jobs/debug", status_code=202)
+async def submit_debug(body: Dict, request: Request, response: Response):
+    """Queues code analysis and returns the job id right away.
+    A retried submission with the same Idempotency-Key gets the original job back."""
+    code = body.get("code")
+    if not isinstance(code, str) or not code.strip():
+        raise HTTPException(status_code=422, detail="'code' must be a non-empty string.")
+    user_id = get_user_id(request)
+    key = parse_idempotency_key(request)
+
+    async def submit():
+        await rate_limiter.check_user(user_id, "debug")
+        try:
+            job = await submit_debug_job(code, user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        return {
+            "id": job["id"],
+            "poll_url": f"/api/jobs/{job['id']}",
+            "events_url": f"/api/jobs/{job['id']}/events",
         }
-        return response
-    
-    except Exception as e:
-        # Good practice: handle errors gracefully
-        raise HTTPException(status_code=500, detail=str(e))
+
+    if key is None:
+        submitted = await submit()
+    else:
+        submitted = await run_idempotent(("jobs/debug", user_id, key), body, submit, response)
+    job = await job_queue.get(submitted["id"])
+    # A replayed job may have finished or expired since; report it as it is now
+    return {**(public_job(job) if job else {"id": submitted["id"]}), **submitted}
+
+# Accessible at: your-app.vercel.app/api/run
+@app.post("/api/run")
+async def run_code(body: Dict, request: Request):
+    """Compiles and runs learner code in a warm sandbox under CPU, memory, time and output limits.
+    Byte-identical submissions are answered from the compile cache; crates come from the lesson's crate set."""
+    code = body.get("code")
+    stdin = body.get("stdin", "")
+    if not isinstance(code, str) or not code.strip():
+        raise HTTPException(status_code=422, detail="'code' must be a non-empty string.")
+    if not isinstance(stdin, str):
+        raise HTTPException(status_code=422, detail="'stdin' must be a string.")
+    user_id = get_user_id(request)
+    await rate_limiter.check_user(user_id, "run")
+    crate_set = crate_set_for_day(parse_day_index(body))
+    try:
+        result = await execution_pool.execute(code, stdin, user_id=user_id, crate_set=crate_set)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RunSuperseded as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"status": "success", **result}
+
+# Accessible at: your-app.vercel.app/api/grade
+@app.post("/api/grade")
+async def grade_code(body: Dict, request: Request):
+    """Compiles a challenge submission once and runs it against every test case of the day's challenge.
+    Only challenges with machine-checkable output are graded (see grading.challenge_test_cases);
+    the others answer 404."""
+    code = body.get("code")
+    if not isinstance(code, str) or not code.strip():
+        raise HTTPException(status_code=422, detail="'code' must be a non-empty string.")
+    day_index = parse_day_index(body)
+    cases = test_cases_for_day(day_index)
+    if not cases:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Day {day_index}'s challenge has no test cases to grade against; it is checked by reading the output.",
+        )
+    user_id = get_user_id(request)
+    await rate_limiter.check_user(user_id, "grade")
+    try:
+        result = await grade_submission(
+            code, cases, user_id=user_id, crate_set=crate_set_for_day(day_index), fail_fast=bool(body.get("fail_fast")),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RunSuperseded as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"status": "success", **result}
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Polls a job: status, and the result once it has finished."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found (it may have expired).")
+    return public_job(job)
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    """Pushes job status changes as SSE frames, ending with a `result` frame."""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found (it may have expired).")
+
+    async def frames():
+        last_status = None
+        while True:
+            job = await job_queue.get(job_id)
+            if job is None:
+                yield format_sse("error", {"detail": "Job expired."})
+                return
+            if job["status"] in (SUCCEEDED, FAILED):
+                yield format_sse("result", public_job(job))
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield format_sse("status", {"id": job_id, "status": last_status})
+            # Woken immediately by workers in this process; re-polls for others
+            await job_queue.wait_for_change(job_id, timeout=1.0)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/search")
+def search_lessons(q: str, k: int = Query(5, ge=1, le=50), day_index: Optional[int] = None):
+    """Ranked full-text (BM25) search over lesson titles, theory and code."""
+    # Accessible at: your-app.vercel.app/api/search?q=String::from
+    index = get_bm25_index()
+    results = index.search(q, k=len(index.passages))
+    if day_index is not None:
+        results = [r for r in results if r["day_index"] == day_index]
+    return {"query": q, "results": results[:k]}
+
+# Accessible at: your-app.vercel.app/api/lessons/{day_index}/snippets
+@app.get("/api/lessons/{day_index}/snippets")
+def get_lesson_snippets(day_index: int):
+    """Precomputed compile/run results of the day's core and pitfall examples (see api/_lib/snippets.py)."""
+    return {
+        "day_index": day_index,
+        "snippets": [
+            {
+                "id": entry["id"],
+                "kind": entry["kind"],
+                "expect": entry["expect"],
+                "verified": "result" in entry and entry["expect"] != "needs-context" and not entry["problem"],
+                **{
+                    key: entry["result"].get(key)
+                    for key in ("outcome", "error_codes", "diagnostics", "stdout", "stderr")
+                    if "result" in entry
+                },
+            }
+            for entry in snippets_for_day(day_index)
+        ],
+    }
 
 @app.get("/api/status")
 def get_status():
     """Simple health check endpoint."""
     # Accessible at: your-app.vercel.app/api/status
     return {"status": "ok", "runtime": "Python FastAPI"}
+
+@app.get("/api/metrics")
+def get_metrics():
+    """Cache and pipeline counters for dashboards."""
+    # Accessible at: your-app.vercel.app/api/metrics
+    return {
+        "answer_paths": dict(answer_paths),
+        "response_cache": response_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "single_flight": agent_flights.stats(),
+        "token_meter": token_meter.stats(),
+        "llm_router": llm_router.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "prompt_prefix": prompt_templates.stats(),
+        "jobs": job_queue.stats(),
+        "deadlines": deadline_stats(),
+        "idempotency": idempotency_store.stats(),
+        "execution_pool": execution_pool.stats(),
+        "compile_cache": compile_cache.stats(),
+        "build_cache": build_cache.stats(),
+    }
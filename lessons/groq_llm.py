@@ -1,95 +1,185 @@
+import asyncio
 import os
-from groq import Groq
-from groq.types.chat import ChatCompletion
+from typing import List, Optional
 
-from dotenv import load_dotenv
+# Importing this module is cheap and has no side effects: the .env file is
+# read and the client is created the first time a request is made. That
+# keeps it safe to import from web workers and job runners.
+
+DEFAULT_MODEL = "llama3-70b-8192"
+
+# Connections kept open to the Groq API and shared by every request
+MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", "20"))
+
+_client = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
 
-# 1. Load environment variables from the .env file
-# This must be called BEFORE trying to access the variables
-load_dotenv()
 
 # 1. Setup and Initialization
-# The Groq client automatically looks for the GROQ_API_KEY environment variable.
-# To make this code runnable without setting the environment variable first,
-# you can temporarily hardcode your key here, but using environment variables
-# is the recommended best practice for production/shared code.
-#
-# Replace "YOUR_GROQ_API_KEY" with your actual key if you are not
-# setting GROQ_API_KEY as an environment variable.
-#
-# NOTE: In a real-world scenario, you should set this as an environment variable!
-API_KEY = os.environ.get("GROQ_API_KEY", "YOUR_GROQ_API_KEY")
-
-if API_KEY == "YOUR_GROQ_API_KEY":
-    print("WARNING: Please replace 'YOUR_GROQ_API_KEY' or set the GROQ_API_KEY environment variable.")
-
-try:
-    client = Groq(api_key=API_KEY)
-except Exception as e:
-    print(f"Error initializing Groq client: {e}")
-    exit()
-
-# 2. Function to interact with the model
-def get_groq_response(prompt: str, model_name: str = "llama3-70b-8192") -> str:
+def get_client():
     """
-    Generates a response from a specified Groq model.
+    Returns the shared AsyncGroq client, creating it on first use.
 
-    :param prompt: The user's query.
-    :param model_name: The model ID to use (e.g., 'llama3-70b-8192', 'mixtral-8x7b-32768').
-    :return: The generated text response.
+    The client owns one pooled set of HTTP connections, so concurrent calls
+    reuse connections instead of opening a new one each time. Connections
+    belong to the event loop that opened them, so a new loop (e.g. a second
+    asyncio.run()) gets a fresh client.
+
+    The Groq client reads the GROQ_API_KEY environment variable, which can
+    also come from a .env file. Hardcoding keys in source is not recommended.
     """
-    print("-" * 50)
-    print(f"Model: {model_name}")
-    print(f"Prompt: {prompt}\n")
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is not None and _client_loop is not loop:
+        _discard_client()
+    if _client is None:
+        import httpx
+        from dotenv import load_dotenv
+        from groq import AsyncGroq, DefaultAsyncHttpxClient
 
-    try:
-        # Call the chat completions endpoint
-        chat_completion: ChatCompletion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            # Use a fast model like Llama 3 70B for general tasks
-            model=model_name,
-            temperature=0.7, # Controls randomness
+        load_dotenv()
+        api_key = os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            raise RuntimeError("Set the GROQ_API_KEY environment variable (or put it in a .env file).")
+        _client = AsyncGroq(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            ),
         )
+        _client_loop = loop
+    return _client
+
+
+def _discard_client() -> None:
+    """
+    Lets go of a client made on another event loop. If that loop still runs
+    (in another thread) the client is closed there; a stopped loop's
+    connections can't be closed from this one, so the client is dropped and
+    its sockets are released with it.
+    """
+    global _client, _client_loop
+    old, old_loop = _client, _client_loop
+    _client, _client_loop = None, None
+    if old_loop is not None and old_loop.is_running():
+        asyncio.run_coroutine_threadsafe(old.close(), old_loop)
 
-        # Extract the text and associated metadata
-        content = chat_completion.choices[0].message.content
-        prompt_time = chat_completion.usage.prompt_time / 1000 if chat_completion.usage else 'N/A'
-        completion_time = chat_completion.usage.completion_time / 1000 if chat_completion.usage else 'N/A'
-        total_time = chat_completion.usage.total_time / 1000 if chat_completion.usage else 'N/A'
-
-        print("--- Response ---")
-        print(content)
-        print("\n--- Performance Metrics (Times in seconds) ---")
-        print(f"Prompt Processing Time: {prompt_time}")
-        print(f"Completion Generation Time: {completion_time}")
-        print(f"Total Inference Time: {total_time}")
-        print("-" * 50)
-        return content
 
+async def close_client() -> None:
+    """Closes the shared client's connections (call on shutdown)."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.close()
+    _client, _client_loop = None, None
+
+
+# 2. Functions to interact with the model
+async def get_groq_completion(prompt: str, model_name: str = DEFAULT_MODEL):
+    """
+    Sends one prompt and returns the full ChatCompletion, including the
+    usage/timing metadata. Errors are raised to the caller.
+    """
+    return await get_client().chat.completions.create(
+        messages=[
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        # Use a fast model like Llama 3 70B for general tasks
+        model=model_name,
+        temperature=0.7,  # Controls randomness
+    )
+
+
+async def get_groq_response_async(prompt: str, model_name: str = DEFAULT_MODEL) -> str:
+    """
+    Generates a response from a specified Groq model without blocking the event loop.
+
+    :param prompt: The user's query.
+    :param model_name: The model ID to use (e.g., 'llama3-70b-8192', 'mixtral-8x7b-32768').
+    :return: The generated text response, or "Error: ..." if the call failed.
+    """
+    try:
+        chat_completion = await get_groq_completion(prompt, model_name)
+        return chat_completion.choices[0].message.content
     except Exception as e:
         # Groq's free tier has rate limits (RPM/TPM). A 429 error means you hit a limit.
-        print(f"An error occurred during API call: {e}")
         return f"Error: {e}"
 
+
+async def get_groq_responses(prompts: List[str], concurrency: int = 4, model_name: str = DEFAULT_MODEL) -> List[str]:
+    """
+    Answers many prompts at once over the shared connection pool, with at
+    most `concurrency` requests in flight. Results are in the same order as
+    `prompts`; a failed prompt gives "Error: ..." without affecting the rest.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def answer(prompt: str) -> str:
+        async with semaphore:
+            return await get_groq_response_async(prompt, model_name)
+
+    return await asyncio.gather(*(answer(prompt) for prompt in prompts))
+
+
+def get_groq_response(prompt: str, model_name: str = DEFAULT_MODEL) -> str:
+    """
+    Blocking wrapper around get_groq_response_async, for scripts and the
+    REPL. Don't call it from async code (e.g. a FastAPI handler): await
+    get_groq_response_async there instead.
+    """
+    async def run() -> str:
+        try:
+            return await get_groq_response_async(prompt, model_name)
+        finally:
+            await close_client()
+
+    return asyncio.run(run())
+
+
 # 3. Running the Examples
-if __name__ == "__main__":
-    # Example 1: Use the Llama 3 70B model
-    get_groq_response(
-        prompt="Explain the difference between Groq's LPU architecture and a standard GPU in one sentence."
-    )
+async def _demo() -> None:
+    examples = [
+        # Example 1: Use the Llama 3 70B model
+        ("Explain the difference between Groq's LPU architecture and a standard GPU in one sentence.", DEFAULT_MODEL),
+        # Example 2: Use a different fast model, like Mixtral 8x7B (requires specifying the model ID)
+        # Note: Availability of models may change. Always check Groq docs for current IDs.
+        ("List three benefits of using MoE (Mixture of Experts) models like Mixtral.", "mixtral-8x7b-32768"),
+    ]
+    try:
+        # Both requests run concurrently over the same connection pool
+        completions = await asyncio.gather(
+            *(get_groq_completion(prompt, model_name) for prompt, model_name in examples),
+            return_exceptions=True,
+        )
+        for (prompt, model_name), chat_completion in zip(examples, completions):
+            print("-" * 50)
+            print(f"Model: {model_name}")
+            print(f"Prompt: {prompt}\n")
+            if isinstance(chat_completion, Exception):
+                print(f"An error occurred during API call: {chat_completion}")
+                continue
+            usage = chat_completion.usage
+            print("--- Response ---")
+            print(chat_completion.choices[0].message.content)
+            print("\n--- Performance Metrics (Times in seconds) ---")
+            print(f"Prompt Processing Time: {usage.prompt_time if usage else 'N/A'}")
+            print(f"Completion Generation Time: {usage.completion_time if usage else 'N/A'}")
+            print(f"Total Inference Time: {usage.total_time if usage else 'N/A'}")
 
-    # Example 2: Use a different fast model, like Mixtral 8x7B (requires specifying the model ID)
-    # Note: Availability of models may change. Always check Groq docs for current IDs.
-    get_groq_response(
-        prompt="List three benefits of using MoE (Mixture of Experts) models like Mixtral.",
-        model_name="mixtral-8x7b-32768"
-    )
+        # Many prompts at once, answers in the same order
+        prompts = [f"In one sentence, what does the Rust keyword `{kw}` do?" for kw in ("let", "mut", "match", "impl")]
+        for prompt, answer in zip(prompts, await get_groq_responses(prompts, concurrency=2)):
+            print("-" * 50)
+            print(f"{prompt}\n{answer}")
+        print("-" * 50)
+    finally:
+        await close_client()
 
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
     print("\nScript finished.")
-# To run this script, save it as a .py file and run 'python groq_example.py'
-# Remember to first install the library: pip install groq
+# To run this script, save it as a .py file and run 'python groq_llm.py'
+# Remember to first install the libraries: pip install groq python-dotenv
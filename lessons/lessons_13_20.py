@@ -31,7 +31,7 @@ LESSONS = [
     },
     "pitfall_example": {
       "explanation": "You cannot borrow mutably while an immutable borrow exists.",
-      "code": "let mut s = String::from(\"hello\");\nlet r1 = &s;\nlet r2 = &mut s; // ❌ cannot borrow mutably"
+      "code": "let mut s = String::from(\"hello\");\nlet r1 = &s;\nlet r2 = &mut s; // ❌ cannot borrow mutably\nprintln!(\"{}\", r1);"
     },
     "challenge": {
       "task": "Write a function that takes &mut String and appends \"!\" to it.",
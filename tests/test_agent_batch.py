@@ -0,0 +1,72 @@
+import asyncio
+import random
+import time
+
+from api._lib import agent
+from api._lib.deadline import Deadline
+from api._lib.ratelimit import MemoryBucketStore, RateLimiter
+
+
+def test_batch_keeps_order_isolates_failures_and_bounds_concurrency(monkeypatch):
+    in_flight = [0, 0]  # current, peak
+    hedged = []
+
+    def retrieve(queries, day_indexes):
+        return [[{"query": query}] for query in queries]
+
+    async def pipeline(item, user_id, passages, deadline, hedge=True):
+        hedged.append(hedge)
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        try:
+            await asyncio.sleep(random.uniform(0, 0.01))
+            if item["query"] == "q2":
+                raise RuntimeError("backend exploded")
+            return {"status": "success", "answer": item["query"], "passages": passages}
+        finally:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr(agent, "retrieve_context_batch", retrieve)
+    monkeypatch.setattr(agent, "run_agent_pipeline", pipeline)
+    monkeypatch.setattr(agent, "rate_limiter", RateLimiter(store=MemoryBucketStore(), burst=100))
+    items = [{"query": f"q{i}"} for i in range(10)]
+
+    results = asyncio.run(agent.run_agent_batch(items, "ada", Deadline(5)))
+    assert [r.get("answer") for r in results] == [None if i == 2 else f"q{i}" for i in range(10)]
+    assert results[2] == {"status": "error", "detail": "backend exploded"}
+    # Each item gets its own retrieved passages
+    assert results[5]["passages"] == [{"query": "q5"}]
+    assert in_flight[1] <= agent.BATCH_CONCURRENCY
+    assert not any(hedged)
+
+
+def test_items_over_the_rate_limit_report_it(monkeypatch):
+    async def pipeline(item, user_id, passages, deadline, hedge=True):
+        return {"status": "success", "answer": item["query"]}
+
+    monkeypatch.setattr(agent, "retrieve_context_batch", lambda queries, days: [[] for _ in queries])
+    monkeypatch.setattr(agent, "run_agent_pipeline", pipeline)
+    monkeypatch.setattr(agent, "rate_limiter", RateLimiter(store=MemoryBucketStore(), burst=3))
+
+    results = asyncio.run(agent.run_agent_batch([{"query": f"q{i}"} for i in range(5)], "ada"))
+    assert [r["status"] for r in results] == ["success"] * 3 + ["error"] * 2
+    assert results[3]["retry_after"] >= 1
+
+
+def test_slow_retrieval_falls_back_to_no_passages(monkeypatch):
+    seen = []
+
+    def slow_retrieve(queries, day_indexes):
+        time.sleep(0.5)
+        return [[{"late": True}] for _ in queries]
+
+    async def pipeline(item, user_id, passages, deadline, hedge=True):
+        seen.append(passages)
+        return {"status": "success"}
+
+    monkeypatch.setattr(agent, "retrieve_context_batch", slow_retrieve)
+    monkeypatch.setattr(agent, "run_agent_pipeline", pipeline)
+    monkeypatch.setattr(agent, "rate_limiter", RateLimiter(store=MemoryBucketStore(), burst=10))
+    # Retrieval may use 15% of the 1s budget
+    asyncio.run(agent.run_agent_batch([{"query": "q"}, {"query": "r"}], "ada", Deadline(1)))
+    assert seen == [[], []]
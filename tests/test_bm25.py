@@ -0,0 +1,44 @@
+import json
+
+from api._lib.bm25 import BM25Index, get_bm25_index, tokenize
+from api._lib.corpus import lesson_passages
+from api._lib.snapshot import SNAPSHOT_DIR, MANIFEST_FILE
+
+
+def test_rust_syntax_stays_intact():
+    assert tokenize("String::from println! &mut -> =>") == [
+        "string::from", "string", "from", "println!", "println", "&mut", "mut", "->", "=>",
+    ]
+
+
+def test_lifetimes_but_not_contractions_or_quotes():
+    assert tokenize("fn f<'a>(x: &'a str) -> &'static str") == [
+        "fn", "f", "'a", "x", "&", "'a", "str", "->", "&", "'static", "str",
+    ]
+    assert tokenize("I can't, it doesn't") == ["i", "can", "t", "it", "doesn", "t"]
+    assert tokenize("let c = 'a'; say 'hello'") == ["let", "c", "a", "say", "hello"]
+
+
+def test_ranking_prefers_the_lesson_on_the_topic():
+    index = BM25Index([
+        {"title": "Lifetimes", "topic_slug": "lifetimes", "text": "Annotate with 'a so references outlive."},
+        {"title": "Strings", "topic_slug": "strings", "text": "String::from makes an owned String; you can't borrow it forever."},
+        {"title": "Vectors", "topic_slug": "vectors", "text": "A Vec holds many values."},
+    ])
+    assert [r["title"] for r in index.search("lifetime 'a")] == ["Lifetimes"]
+    assert [r["title"] for r in index.search("string from")][0] == "Strings"
+    # "can't" doesn't make a lifetime token that matches 't
+    assert index.search("'t") == []
+    assert index.search("nothing here") == []
+
+
+def test_real_lessons_rank_on_topic():
+    top = get_bm25_index().search("hashmap word count", k=1)[0]
+    assert top["topic_slug"] == "hashmaps"
+
+
+def test_snapshot_matches_the_current_tokenizer():
+    # Regenerate with `python -m api._lib.snapshot` after changing tokenize()
+    manifest = json.loads((SNAPSHOT_DIR / MANIFEST_FILE).read_text(encoding="utf-8"))
+    fresh = json.loads(json.dumps(BM25Index(lesson_passages()).to_state()))
+    assert manifest["bm25"]["postings"] == fresh["postings"]
@@ -0,0 +1,32 @@
+import asyncio
+
+from api._lib import build_cache as build_cache_module
+from api._lib.build_cache import CRATE_SETS, TOPIC_CRATE_SETS, BuildCache, DependencyArtifacts, crate_set_for_day
+
+
+def test_topic_crate_sets_exist():
+    assert set(TOPIC_CRATE_SETS.values()) <= set(CRATE_SETS)
+
+
+def test_std_only_lessons_resolve_to_std():
+    # Days 1 (setup) and 30 (std::fs) use no crates
+    assert crate_set_for_day(1) == "std"
+    assert crate_set_for_day(30) == "std"
+    assert crate_set_for_day(None) == "std"
+
+
+def test_unbuilt_crate_set_falls_back_to_std_without_waiting(tmp_path, monkeypatch):
+    async def slow_build(crate_set):
+        await asyncio.sleep(10)
+        return DependencyArtifacts(crate_set, "deps", {"rand": "librand.rlib"})
+
+    monkeypatch.setattr(build_cache_module, "_build_crate_set", slow_build)
+
+    async def scenario():
+        cache = BuildCache(root=tmp_path)
+        artifacts = await asyncio.wait_for(cache.artifacts("rand"), timeout=1)
+        for build in cache._builds.values():
+            build.cancel()
+        return artifacts.crate_set, cache.fallbacks
+
+    assert asyncio.run(scenario()) == ("std", 1)
@@ -0,0 +1,43 @@
+from api._lib import cache as cache_module
+from api._lib.cache import TTLCache, normalize_query, response_cache_key
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=8, ttl=10)
+    cache.set("a", 1)
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_binding_a_new_version_drops_everything():
+    cache = TTLCache()
+    cache.bind_version("v1")
+    cache.set("a", 1)
+    cache.bind_version("v1")
+    assert cache.get("a") == 1
+    cache.bind_version("v2")
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
+
+
+def test_equivalent_questions_share_a_key():
+    assert normalize_query("  What is   Ownership?? ") == "what is ownership"
+    assert response_cache_key("What is ownership?", 3, None, "v1") == response_cache_key("what is  ownership", 3, "", "v1")
+    assert response_cache_key("What is ownership?", 3, None, "v1") != response_cache_key("What is ownership?", 4, None, "v1")
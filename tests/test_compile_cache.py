@@ -0,0 +1,53 @@
+import asyncio
+
+from api._lib.compile_cache import CompileCache, compile_cache_key, is_cacheable, normalize_source
+
+
+def result(stdout="", timed_out=False):
+    return {"compile": {"timed_out": False}, "run": {"stdout": stdout, "timed_out": timed_out}}
+
+
+def test_formatting_only_changes_share_a_key():
+    assert normalize_source("fn main() {}\r\n\r\n") == normalize_source("fn main() {}   \n")
+    limits = {"cpu_seconds": 2}
+    assert compile_cache_key("fn main() {}\r\n", "", "rustc 1.80", limits) == compile_cache_key("fn main() {}", "", "rustc 1.80", limits)
+    assert compile_cache_key("fn main() {}", "", "rustc 1.80", limits) != compile_cache_key("fn main() {}", "", "rustc 1.81", limits)
+    assert compile_cache_key("fn main() {}", "", "rustc 1.80", limits) != compile_cache_key("fn main() {}", "", "rustc 1.80", limits, "rand")
+
+
+def test_wall_clock_timeouts_are_not_cached():
+    assert is_cacheable(result())
+    assert not is_cacheable(result(timed_out=True))
+
+
+def test_hits_misses_and_lru_eviction(tmp_path):
+    cache = CompileCache(str(tmp_path / "cache.db"), max_bytes=300)
+
+    async def scenario():
+        assert await cache.get("a") is None
+        await cache.set("a", result("a" * 50))
+        await cache.set("b", result("b" * 50))
+        assert (await cache.get("a"))["run"]["stdout"] == "a" * 50
+        # "b" is now the least recently used and goes first
+        await cache.set("c", result("c" * 50))
+        return [await cache.get(key) is not None for key in "abc"]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert 0 < stats["bytes"] <= 300
+
+
+def test_running_totals_follow_replacements(tmp_path):
+    cache = CompileCache(str(tmp_path / "cache.db"))
+
+    async def scenario():
+        await cache.set("a", result("short"))
+        await cache.set("a", result("a much longer output"))
+
+    asyncio.run(scenario())
+    # stats() runs on another thread (the metrics route) with its own connection
+    entries, size = cache._connect().execute("SELECT COUNT(*), SUM(size) FROM results").fetchone()
+    assert cache.stats()["entries"] == entries == 1
+    assert cache.stats()["bytes"] == size
@@ -0,0 +1,21 @@
+from api._lib.context import pack_context
+
+
+def passage(pid, day_index, section, text, score):
+    return {"id": pid, "day_index": day_index, "topic_slug": f"topic-{day_index}", "section": section,
+            "title": f"Day {day_index}", "text": text, "score": score}
+
+
+def test_current_day_passages_do_not_use_the_budget():
+    today = passage("d4-theory", 4, "theory", "ownership moves values " * 8, 1.0)
+    other = passage("d12-theory", 12, "theory", "borrowing lends a reference instead " * 6, 0.9)
+    # Both don't fit, and today's passage (already in the prefix) ranks first
+    assert [p["id"] for p in pack_context([today, other], budget=100)] == ["d4-theory"]
+    assert [p["id"] for p in pack_context([today, other], budget=100, day_index=4)] == ["d12-theory"]
+
+
+def test_duplicates_and_weak_matches_are_skipped():
+    best = passage("a", 3, "theory", "integers floats booleans and chars are scalar types", 1.0)
+    same_section = passage("b", 3, "theory", "something else entirely about types, at greater length " * 3, 0.9)
+    weak = passage("c", 9, "theory", "loops repeat code", 0.2)
+    assert [p["id"] for p in pack_context([best, same_section, weak])] == ["a"]
@@ -0,0 +1,55 @@
+import asyncio
+
+from api._lib import deadline as deadline_module
+from api._lib.deadline import (
+    DEFAULT_DEADLINE_SECONDS,
+    MAX_DEADLINE_SECONDS,
+    MIN_DEADLINE_SECONDS,
+    Deadline,
+    run_stage,
+)
+
+
+def test_client_budget_is_clamped():
+    assert Deadline.from_headers({"x-deadline-ms": "5000"}).budget == 5.0
+    assert Deadline.from_headers({"x-deadline-ms": "10"}).budget == MIN_DEADLINE_SECONDS
+    assert Deadline.from_headers({"x-deadline-ms": "999999"}).budget == MAX_DEADLINE_SECONDS
+    assert Deadline.from_headers({"x-deadline-ms": "soon"}).budget == DEFAULT_DEADLINE_SECONDS
+    assert Deadline.from_headers({}).budget == DEFAULT_DEADLINE_SECONDS
+
+
+def test_stage_slices_never_outlast_the_deadline(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(deadline_module.time, "monotonic", lambda: now[0])
+    deadline = Deadline(10)
+    assert deadline.slice("retrieval") == 1.5
+    assert deadline.slice("tool") == 1.0
+    # The LLM gets whatever is left
+    assert deadline.slice("llm") == 10
+    now[0] += 9.5
+    assert deadline.slice("retrieval") == 0.5
+    assert deadline.slice("llm") == 0.5
+    now[0] += 5
+    assert deadline.remaining() == 0.0
+
+
+def test_stage_that_runs_out_returns_the_fallback(monkeypatch):
+    monkeypatch.setattr(deadline_module, "stage_timeouts", deadline_module.Counter())
+
+    async def slow():
+        await asyncio.sleep(1)
+        return "late"
+
+    async def fast():
+        return "on time"
+
+    async def scenario():
+        deadline = Deadline(1)
+        return (
+            await run_stage(deadline, "retrieval", slow(), "fallback"),
+            await run_stage(deadline, "retrieval", fast(), "fallback"),
+            await run_stage(None, "retrieval", fast(), "fallback"),
+        )
+
+    assert asyncio.run(scenario()) == ("fallback", "on time", "on time")
+    assert deadline_module.stage_timeouts["retrieval"] == 1
@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from api._lib import debugger
+from api._lib.metering import TokenBudgetExceeded, TokenMeter
+
+DIAGNOSTICS = [{"rendered": "error[E0384]: cannot assign twice to immutable variable `x`", "message": ""}]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    async def stream_chat(messages, hedge=False):
+        yield SimpleNamespace(text="Make `x` mutable.", model="test-model", usage={"prompt_tokens": 40, "completion_tokens": 5})
+
+    monkeypatch.setattr(debugger.llm, "is_configured", lambda: True)
+    monkeypatch.setattr(debugger.llm, "stream_chat", stream_chat)
+
+
+def test_explanation_is_metered_to_the_submitter(fake_llm, monkeypatch):
+    meter = TokenMeter(budget=1000)
+    monkeypatch.setattr(debugger, "token_meter", meter)
+    explanation = asyncio.run(debugger.explain_diagnostics("fn main() {}", DIAGNOSTICS, "ada"))
+    assert explanation == "Make `x` mutable."
+    assert meter.used("ada") == 45
+
+
+def test_explanation_respects_the_daily_budget(fake_llm, monkeypatch):
+    monkeypatch.setattr(debugger, "token_meter", TokenMeter(budget=10))
+    with pytest.raises(TokenBudgetExceeded):
+        asyncio.run(debugger.explain_diagnostics("fn main() {}", DIAGNOSTICS, "ada"))
+
+
+def test_llm_failure_still_returns_the_diagnostics(monkeypatch):
+    async def check_code(code):
+        return {"compiled": False, "diagnostics": DIAGNOSTICS}
+
+    async def explain_diagnostics(code, diagnostics, user_id):
+        raise ConnectionError("Groq is down")
+
+    monkeypatch.setattr(debugger, "check_code", check_code)
+    monkeypatch.setattr(debugger, "explain_diagnostics", explain_diagnostics)
+    result = asyncio.run(debugger.run_debugger_job({"code": "fn main() {}", "user_id": "ada"}))
+    assert result["diagnostics"] == DIAGNOSTICS
+    assert result["explanation"] is None
+    assert "Groq is down" in result["explanation_skipped"]
+
+
+def test_analysis_jobs_are_not_shared_across_users():
+    assert debugger.analysis_key("fn main() {}", "ada") == debugger.analysis_key(" fn main() {}\n", "ada")
+    assert debugger.analysis_key("fn main() {}", "ada") != debugger.analysis_key("fn main() {}", "grace")
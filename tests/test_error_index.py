@@ -0,0 +1,34 @@
+from api._lib import error_index
+
+INDEX = {
+    "E0382": {"summary": "Use of a moved value.", "details": "", "example": "", "fixed": "",
+              "lessons": [{"day_index": 4, "title": "Ownership", "note": "Clone or borrow instead."}]},
+    "E0384": {"summary": "Assigned twice to an immutable variable.", "details": "", "example": "let x = 1; x = 2;",
+              "fixed": "", "lessons": []},
+}
+
+
+def test_known_codes_in_order_of_appearance(monkeypatch):
+    monkeypatch.setattr(error_index, "_read_index", lambda: INDEX)
+    assert error_index.known_codes("Why E0384 and then E0382?", "error[E0384]") == ["E0384", "E0382"]
+    # Codes rustc doesn't know (or we didn't index) are ignored
+    assert error_index.known_codes("E0999 E03820") == []
+
+
+def test_lowercase_codes_are_found(monkeypatch):
+    monkeypatch.setattr(error_index, "_read_index", lambda: INDEX)
+    assert error_index.known_codes("what does e0382 mean") == ["E0382"]
+
+
+def test_non_string_input_is_skipped(monkeypatch):
+    monkeypatch.setattr(error_index, "_read_index", lambda: INDEX)
+    assert error_index.known_codes(None, 123, ["E0382"], "E0382") == ["E0382"]
+
+
+def test_answer_explains_codes_with_their_lessons(monkeypatch):
+    monkeypatch.setattr(error_index, "_read_index", lambda: INDEX)
+    answer = error_index.answer_for_codes(["E0382", "E0384"])
+    assert "**E0382**: Use of a moved value." in answer
+    assert "Covered on day 4 (Ownership)" in answer
+    assert "```rust\nlet x = 1; x = 2;\n```" in answer
+    assert answer.count("rustc --explain") == 2
@@ -0,0 +1,52 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+from api._lib import executor
+
+
+def _run(code: str, tmp_path: Path, wall_seconds: float = 2.0):
+    return asyncio.run(executor.run_limited(
+        [sys.executable, "-c", code], tmp_path, env=executor.sandbox_env(tmp_path), wall_seconds=wall_seconds,
+        cpu_seconds=2, memory_mb=512, output_bytes=4096, processes=64,
+    ))
+
+
+def test_server_environment_is_not_inherited(tmp_path, monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "server-secret")
+    result = _run("import os; print(sorted(os.environ))", tmp_path)
+    assert "GROQ_API_KEY" not in result["stdout"]
+    assert "'HOME'" in result["stdout"]
+
+
+def test_wall_clock_covers_a_process_that_closed_its_output(tmp_path):
+    result = _run("import os, time; os.close(1); os.close(2); time.sleep(30)", tmp_path, wall_seconds=1.0)
+    assert result["timed_out"]
+    assert result["duration_ms"] < 5000
+
+
+def test_refuses_to_run_without_isolation(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor, "EXEC_JAIL", "bwrap")
+    monkeypatch.setattr(executor.shutil, "which", lambda name: None)
+    with pytest.raises(RuntimeError, match="isolation is unavailable"):
+        executor.jail_command(["./submission"], tmp_path, executor.sandbox_env(tmp_path))
+
+
+def test_closing_a_pool_keeps_other_pools_sandboxes(tmp_path, monkeypatch):
+    async def warm(sandbox):
+        (sandbox.root / "src").mkdir(parents=True, exist_ok=True)
+
+    monkeypatch.setattr(executor.Sandbox, "warm", warm)
+
+    async def scenario():
+        first = executor.ExecutionPool(size=2, root=tmp_path)
+        second = executor.ExecutionPool(size=2, root=tmp_path)
+        await first.start()
+        await second.start()
+        await first.close()
+        return sorted(path.name for path in tmp_path.iterdir()), [s.root.name for s in second._sandboxes]
+
+    remaining, seconds = asyncio.run(scenario())
+    assert remaining == sorted(seconds)
@@ -0,0 +1,75 @@
+import pytest
+
+from api._lib import grading
+from api._lib.grading import OutputMatcher, challenge_test_cases
+
+
+def matches(expected, output, mode="exact", cap=10_000, chunk=3):
+    matcher = OutputMatcher(expected, cap, mode)
+    data = output.encode("utf-8")
+    # Fed in small chunks, as the output streams in
+    for i in range(0, len(data), chunk):
+        if not matcher.feed(data[i:i + chunk]):
+            return False, matcher.failure
+    return matcher.finish(), matcher.failure
+
+
+def test_exact_match():
+    assert matches("3\n6\n9", "3\n6\n9\n") == (True, None)
+    passed, failure = matches("3\n6\n9", "3\n7\n9\n")
+    assert not passed and "Line 2" in failure
+    passed, failure = matches("3\n6\n9", "3\n6\n")
+    assert not passed and "2 of 3" in failure
+
+
+def test_trailing_whitespace_and_blank_lines_are_ignored():
+    assert matches("Hello, Alex!", "Hello, Alex!   \r\n\n\n")[0]
+    # Leading whitespace and blank lines in between still count
+    assert not matches("Hello, Alex!", "  Hello, Alex!\n")[0]
+    assert not matches("a\nb", "a\n\nb\n")[0]
+    passed, failure = matches("a", "a\n\nextra\n")
+    assert not passed and "extra" in failure
+
+
+def test_regex_lines_must_match_in_full():
+    expected = r"Book \{ title: \".+\", pages: \d+ \}"
+    assert matches(expected, 'Book { title: "Rust 101", pages: 120 }\n', "regex")[0]
+    assert not matches(expected, 'Book { title: "Rust 101", pages: many }\n', "regex")[0]
+    assert not matches(r"\d+", "12 apples\n", "regex")[0]
+
+
+def test_unordered_lines():
+    expected = "apple: 2\nbanana: 1\n"
+    assert matches(expected, "banana: 1\napple: 2\n", "unordered")[0]
+    passed, failure = matches(expected, "apple: 2\napple: 2\n", "unordered")
+    assert not passed and "apple: 2" in failure
+    passed, failure = matches(expected, "banana: 1\n", "unordered")
+    assert not passed and "1 of 2" in failure
+
+
+def test_runaway_output_is_cut_off_early():
+    matcher = OutputMatcher("", cap=1_000_000)
+    fed = 0
+    while matcher.feed(b"\n" * 256):
+        fed += 256
+        assert fed < 10_000
+    assert "longer than expected" in matcher.failure
+
+
+def test_declared_test_cases():
+    challenge = {"test_cases": [
+        {"stdin": "2 3\n", "expected_stdout": "5"},
+        {"name": "negative", "args": ["-1"], "expected_stdout": "-?\\d+", "match": "regex"},
+    ]}
+    assert challenge_test_cases(challenge) == [
+        {"name": "case 1", "stdin": "2 3\n", "args": [], "expected_stdout": "5", "match": "exact"},
+        {"name": "negative", "stdin": "", "args": ["-1"], "expected_stdout": "-?\\d+", "match": "regex"},
+    ]
+    with pytest.raises(ValueError):
+        challenge_test_cases({"test_cases": [{"expected_stdout": "", "match": "fuzzy"}]})
+
+
+def test_only_challenges_with_real_output_are_graded():
+    assert grading.test_cases_for_day(11)[0]["expected_stdout"] == "3\n6\n9"
+    # Prose descriptions (snake_case expected_output) aren't test cases
+    assert challenge_test_cases({"task": "...", "expected_output": "Correctly returns the longer slice."}) == []
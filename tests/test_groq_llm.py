@@ -0,0 +1,31 @@
+import asyncio
+import random
+
+from api._lib import llm
+from lessons import groq_llm
+
+
+def test_responses_keep_prompt_order_within_the_concurrency_limit(monkeypatch):
+    in_flight = [0, 0]  # current, peak
+
+    async def respond(prompt, model_name):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight[1], in_flight[0])
+        # Later prompts often finish first
+        await asyncio.sleep(random.uniform(0, 0.01))
+        in_flight[0] -= 1
+        if prompt == "p3":
+            return "Error: rate limited"
+        return prompt.upper()
+
+    monkeypatch.setattr(groq_llm, "get_groq_response_async", respond)
+    prompts = [f"p{i}" for i in range(10)]
+    answers = asyncio.run(groq_llm.get_groq_responses(prompts, concurrency=3))
+    assert answers == [("Error: rate limited" if p == "p3" else p.upper()) for p in prompts]
+    assert in_flight[1] == 3
+
+
+def test_api_and_lessons_share_one_client(monkeypatch):
+    client = object()
+    monkeypatch.setattr(groq_llm, "get_client", lambda: client)
+    assert llm._get_groq_client() is client
@@ -0,0 +1,50 @@
+import asyncio
+
+from api._lib.idempotency import IdempotencyStore
+
+
+def test_completed_result_is_replayed():
+    async def scenario():
+        store = IdempotencyStore()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            return {"answer": 42}
+
+        first = await store.run("key", "body", compute)
+        second = await store.run("key", "body", compute)
+        return calls, first, second
+
+    calls, first, second = asyncio.run(scenario())
+    assert calls == 1
+    assert first == ({"answer": 42}, False)
+    assert second == ({"answer": 42}, True)
+
+
+def test_retry_arriving_as_last_waiter_disconnects_runs_afresh():
+    async def scenario():
+        store = IdempotencyStore()
+        started = asyncio.Event()
+
+        async def compute():
+            started.set()
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                # Unwinding takes a moment, like closing an LLM connection
+                await asyncio.sleep(0.01)
+                raise
+            return "done"
+
+        first = asyncio.ensure_future(store.run("key", "body", compute))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0)
+        # The abandoned task is still unwinding
+        retry = asyncio.ensure_future(store.run("key", "body", compute))
+        await asyncio.gather(first, return_exceptions=True)
+        return await retry
+
+    assert asyncio.run(scenario()) == ("done", False)
@@ -0,0 +1,35 @@
+import asyncio
+
+from api._lib.jobs import SUCCEEDED, JobQueue, JobStore
+
+
+def test_jobs_run_and_listeners_are_cleaned_up(tmp_path):
+    async def scenario():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), workers=1)
+
+        async def handler(payload):
+            return {"doubled": payload["n"] * 2}
+
+        queue.register("double", handler)
+        job = await queue.submit("double", {"n": 21})
+        while (await queue.get(job["id"]))["status"] != SUCCEEDED:
+            await queue.wait_for_change(job["id"], timeout=0.5)
+        # A listener that times out on a job nobody touches leaves nothing behind
+        await queue.wait_for_change("unknown", timeout=0.01)
+        finished = await queue.get(job["id"])
+        await queue.shutdown()
+        return finished["result"], queue._changed, queue._listeners
+
+    assert asyncio.run(scenario()) == ({"doubled": 42}, {}, {})
+
+
+def test_store_is_usable_from_worker_threads(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+
+    async def scenario():
+        job = await asyncio.to_thread(store.create, "debug", {}, "key")
+        found = await asyncio.gather(*(asyncio.to_thread(store.find, "debug", "key") for _ in range(8)))
+        return job["id"], {row["id"] for row in found}
+
+    job_id, found = asyncio.run(scenario())
+    assert found == {job_id}
@@ -0,0 +1,23 @@
+import asyncio
+
+from api._lib.llm_router import LLMRouter
+
+
+def test_closing_after_the_first_chunk_closes_the_backend_stream():
+    closed = []
+
+    async def stream(messages, model):
+        try:
+            yield "first"
+            yield "second"
+        finally:
+            closed.append(model)
+
+    async def scenario():
+        router = LLMRouter([("fake", "model-a")], {"fake": (lambda: True, stream)})
+        chunks = router.stream([{"role": "user", "content": "hi"}])
+        assert await chunks.__anext__() == (("fake", "model-a"), "first")
+        await chunks.aclose()
+        return list(closed)
+
+    assert asyncio.run(scenario()) == ["model-a"]
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from api._lib import metering
+from api._lib.metering import TokenBudgetExceeded, TokenMeter
+
+
+def test_reservations_count_against_the_budget_until_settled():
+    meter = TokenMeter(budget=1000)
+    first = meter.reserve("ada", 600)
+    with pytest.raises(TokenBudgetExceeded):
+        meter.reserve("ada", 600)
+    meter.settle(first, 300, 100, "model")
+    meter.settle(first, 300, 100, "model")
+    assert meter.used("ada") == 400
+    meter.reserve("ada", 600)
+
+
+def test_failed_flushes_keep_a_bounded_queue(monkeypatch):
+    monkeypatch.setattr(metering, "MAX_PENDING_ROWS", 3)
+    meter = TokenMeter()
+
+    async def failing_sink(rows):
+        raise ConnectionError("supabase is down")
+
+    meter.sink = failing_sink
+    for _ in range(5):
+        meter.record("ada", 10, 5, "model")
+    asyncio.run(meter.flush())
+    assert meter.stats()["pending_rows"] == 3
+    assert meter.dropped_rows == 2
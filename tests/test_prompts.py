@@ -0,0 +1,39 @@
+from api._lib.prompts import PromptTemplates
+
+PASSAGES = [
+    {"day_index": 4, "title": "Functions", "section": "theory", "text": "Same-day text."},
+    {"day_index": 12, "title": "Borrowing", "section": "theory", "text": "Borrow with &."},
+]
+
+
+def test_prefix_is_byte_identical_across_learners():
+    templates = PromptTemplates()
+    first = templates.build_messages(4, PASSAGES, "Why E0384?", None)
+    second = templates.build_messages(4, [], "What is a closure?", "fn main() {}")
+    assert first[0] == second[0]
+    assert first[0]["role"] == "system"
+    assert "Day 4" in first[0]["content"]
+    assert templates.prefix(4) is templates.prefix(4)
+
+
+def test_variable_parts_come_last():
+    messages = PromptTemplates().build_messages(4, PASSAGES, "How do I borrow?", "fn main() {}")
+    user = messages[1]["content"]
+    # Today's passage is already in the prefix; other days are appended
+    assert "Same-day text." not in user
+    assert user.index("Borrow with &.") < user.index("Question: How do I borrow?") < user.index("```rust\nfn main() {}")
+
+
+def test_prefix_differs_per_day():
+    templates = PromptTemplates()
+    assert templates.prefix(4) != templates.prefix(5)
+    assert templates.prefix(None).startswith("You are a friendly Rust tutor")
+
+
+def test_prefix_cache_hit_rate():
+    templates = PromptTemplates()
+    templates.record_usage({"prompt_tokens": 1000, "cached_tokens": 800})
+    templates.record_usage({"prompt_tokens": 1000})
+    stats = templates.stats()
+    assert stats["calls"] == 2
+    assert stats["prefix_hit_rate"] == 0.4
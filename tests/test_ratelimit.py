@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi import Request
+
+from api._lib import auth, ratelimit
+from api._lib.ratelimit import MemoryBucketStore, RateLimited, RateLimiter
+
+
+def test_routes_have_separate_buckets():
+    async def scenario():
+        limiter = RateLimiter(store=MemoryBucketStore(), burst=2)
+        await limiter.check_user("ada")
+        await limiter.check_user("ada")
+        with pytest.raises(RateLimited):
+            await limiter.check_user("ada")
+        # Questions used up; running code is still allowed
+        await limiter.check_user("ada", "run")
+        await limiter.check_user("ada", "grade")
+
+    asyncio.run(scenario())
+
+
+def test_refilled_buckets_are_swept(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    store = MemoryBucketStore(sweep_seconds=60)
+    for i in range(100):
+        store.take(f"agent:anon:10.0.0.{i}", rate=1.0, capacity=5)
+    store.take("agent:busy", rate=1 / 120, capacity=5)
+    assert len(store) == 101
+    now[0] += 61
+    store.take("agent:new", rate=1.0, capacity=5)
+    # Only the bucket that is still refilling survives, with the new one
+    assert len(store) == 2
+    assert store.evicted == 100
+    # A swept bucket starts full again, as it would have been anyway
+    assert store.take("agent:anon:10.0.0.1", rate=1.0, capacity=5) == (True, 0.0)
+
+
+def make_request(headers, client=("203.0.113.7", 5000)):
+    return Request({
+        "type": "http",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": client,
+    })
+
+
+def test_anonymous_identity_ignores_client_forwarded_for(monkeypatch):
+    monkeypatch.setattr(auth, "CLIENT_IP_HEADER", "")
+    assert auth.get_user_id(make_request({"X-Forwarded-For": "198.51.100.1"})) == "anon:203.0.113.7"
+
+
+def test_anonymous_identity_uses_the_platform_header(monkeypatch):
+    monkeypatch.setattr(auth, "CLIENT_IP_HEADER", "x-vercel-forwarded-for")
+    request = make_request({"X-Forwarded-For": "198.51.100.1", "X-Vercel-Forwarded-For": "192.0.2.9"})
+    assert auth.get_user_id(request) == "anon:192.0.2.9"
+    assert auth.get_user_id(make_request({})) == "anon:203.0.113.7"
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from api._lib.scheduler import FairScheduler, RunSuperseded
+
+
+def test_users_take_turns_for_the_slots():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, user_cap=1)
+        order = []
+
+        async def run(user_id, group):
+            ticket = await scheduler.acquire(user_id, group)
+            order.append(user_id)
+            await asyncio.sleep(0)
+            scheduler.release(ticket)
+
+        first = await scheduler.acquire("anon:hog", "warmup")
+        tasks = [asyncio.create_task(run("anon:hog", f"tab{i}")) for i in range(3)]
+        tasks.append(asyncio.create_task(run("anon:other", "tab")))
+        await asyncio.sleep(0)
+        scheduler.release(first)
+        await asyncio.gather(*tasks)
+        return order, scheduler.active
+
+    order, active = asyncio.run(scenario())
+    # The second user doesn't wait behind all of the first user's runs
+    assert order.index("anon:other") <= 1
+    assert active == 0
+
+
+def test_newer_run_from_the_same_editor_replaces_the_queued_one():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, user_cap=1)
+        held = await scheduler.acquire("ada", "editor")
+        older = asyncio.create_task(scheduler.acquire("ada", "editor"))
+        await asyncio.sleep(0)
+        newer = asyncio.create_task(scheduler.acquire("ada", "editor"))
+        await asyncio.sleep(0)
+        with pytest.raises(RunSuperseded):
+            await older
+        scheduler.release(held)
+        scheduler.release(await newer)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["superseded"] == 1
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_cancel_while_queued_does_not_leak_the_slot():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, user_cap=1)
+        held = await scheduler.acquire("ada")
+        waiter = asyncio.create_task(scheduler.acquire("grace"))
+        await asyncio.sleep(0)
+        # The cancel lands before the waiter unwinds, in the same step as the release
+        waiter.cancel()
+        scheduler.release(held)
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The slot is free for the next run
+        ticket = await asyncio.wait_for(scheduler.acquire("grace"), timeout=1)
+        scheduler.release(ticket)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0
+    assert stats["queued"] == 0
+
+
+def test_cancelled_waiter_is_not_superseded():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1, user_cap=1)
+        held = await scheduler.acquire("ada", "editor")
+        waiter = asyncio.create_task(scheduler.acquire("ada", "editor"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        newer = asyncio.create_task(scheduler.acquire("ada", "editor"))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        scheduler.release(held)
+        scheduler.release(await newer)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["superseded"] == 0
+    assert stats["active"] == 0
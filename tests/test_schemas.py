@@ -0,0 +1,25 @@
+import pytest
+from pydantic import ValidationError
+
+from api._lib.schemas import MAX_QUERY_CHARS, AgentBatch, AgentQuery
+
+
+@pytest.mark.parametrize(
+    "body",
+    [{}, {"query": None}, {"query": 123}, {"query": ""}, {"query": "hi", "code": 5}, {"query": "x" * (MAX_QUERY_CHARS + 1)}],
+)
+def test_malformed_agent_bodies_are_rejected(body):
+    # FastAPI turns the ValidationError into a 422
+    with pytest.raises(ValidationError):
+        AgentQuery.model_validate(body)
+
+
+def test_query_data_leaves_out_unset_fields():
+    query = AgentQuery.model_validate({"query": "Why E0382?", "day_index": "4", "extra": True})
+    assert query.to_query_data() == {"query": "Why E0382?", "day_index": 4}
+
+
+def test_each_batch_item_is_validated():
+    with pytest.raises(ValidationError):
+        AgentBatch.model_validate({"queries": [{"query": "ok"}, {"query": None}]})
+    assert AgentBatch.model_validate({}).queries == []
@@ -0,0 +1,29 @@
+from api._lib.semantic_cache import SemanticCache
+
+
+def _cache_with(query: str, answer: str) -> SemanticCache:
+    cache = SemanticCache()
+    cache.bind_version("test")
+    cache.set(query, 3, {"text": answer})
+    return cache
+
+
+def test_serves_a_rephrased_question():
+    cache = _cache_with("What is the difference between String and &str?", "owned vs borrowed")
+    assert cache.get("difference between String and &str", 3) == {"text": "owned vs borrowed"}
+
+
+def test_reversed_direction_is_a_different_question():
+    cache = _cache_with("convert a String to an i32", "use parse")
+    assert cache.get("convert an i32 to a String", 3) is None
+
+
+def test_negation_is_a_different_question():
+    cache = _cache_with("can I return a reference from a function", "yes, with a lifetime")
+    assert cache.get("can I not return a reference from a function", 3) is None
+    assert cache.get("why can't I return a reference from a function", 3) is None
+
+
+def test_scoped_per_day():
+    cache = _cache_with("what does mut do", "makes a binding mutable")
+    assert cache.get("what does mut do", 4) is None
@@ -0,0 +1,46 @@
+import asyncio
+
+from api._lib.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flights = SingleFlight()
+        runs = 0
+
+        async def producer():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            yield "answer"
+
+        async def consume():
+            return [event async for event in flights.stream("key", producer)]
+
+        results = await asyncio.gather(consume(), consume(), consume())
+        return runs, results
+
+    runs, results = asyncio.run(scenario())
+    assert runs == 1
+    assert results == [["answer"]] * 3
+
+
+def test_caller_joining_while_abandoned_flight_unwinds_gets_a_fresh_run():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def producer():
+            started.set()
+            await asyncio.sleep(0.05)
+            yield "answer"
+
+        first = asyncio.ensure_future(flights.stream("key", producer).__anext__())
+        await started.wait()
+        first.cancel()
+        # Same tick as the cancellation: the abandoned task has not unwound yet
+        second = asyncio.ensure_future(flights.stream("key", producer).__anext__())
+        await asyncio.gather(first, return_exceptions=True)
+        return await second
+
+    assert asyncio.run(scenario()) == "answer"
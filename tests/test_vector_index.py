@@ -0,0 +1,39 @@
+import numpy as np
+
+from api._lib.vector_index import DIM, VectorIndex, embed_texts, get_index
+
+PASSAGES = [
+    {"id": "a", "title": "Ownership", "topic_slug": "ownership-basics", "text": "A String moves when assigned; clone it to keep both."},
+    {"id": "b", "title": "Vectors", "topic_slug": "vectors", "text": "Vec::new and push grow a vector of values."},
+    {"id": "c", "title": "HashMaps", "topic_slug": "hashmaps", "text": "A HashMap stores key value pairs, e.g. word counts."},
+]
+
+
+def test_embeddings_are_unit_length():
+    vectors = embed_texts(["move a String", "push onto a Vec"])
+    assert vectors.shape == (2, DIM)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-3)
+
+
+def test_batch_search_matches_single_searches():
+    index = VectorIndex.build(PASSAGES)
+    queries = ["clone a moved String", "count words in a map", "push to a vector"]
+    batch = index.search_batch(queries, k=2)
+    assert batch == [index.search(query, k=2) for query in queries]
+    assert [hits[0]["id"] for hits in batch] == ["a", "c", "b"]
+    assert index.search_batch([], k=2) == []
+
+
+def test_saved_index_is_memory_mapped_per_version(tmp_path):
+    index = VectorIndex.build(PASSAGES)
+    index.save(tmp_path, "v1")
+    loaded = VectorIndex.load(tmp_path, "v1")
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.passages == PASSAGES
+    assert loaded.search("clone a moved String", k=1) == index.search("clone a moved String", k=1)
+    # Another corpus version never reads this one's files
+    assert VectorIndex.load(tmp_path, "v2") is None
+
+
+def test_lesson_index_finds_the_topic():
+    assert get_index().search("iterate over a vector of strings", k=1)[0]["topic_slug"] == "vectors"